@@ -0,0 +1,287 @@
+"""Pool of worker processes running yt-dlp extractions.
+
+Extraction is CPU-heavy pure Python (JSON and JS player parsing), so running
+it in the request thread serialises every request on the GIL. Here each
+extraction runs in a separate process, one at a time per worker, and only a
+compact dict of the fields the endpoints use is sent back. A call that
+exceeds its timeout kills its worker, and workers are retired after
+``max_calls`` extractions or once their RSS grows past ``max_rss_mb`` to
+bound the memory yt-dlp leaks across calls.
+
+Workers are forked from a forkserver that has yt-dlp preloaded, so replacing
+one costs a fork rather than a fresh interpreter. With ``size=0`` extraction
+runs inline, for platforms without multiprocessing.
+
+Every result carries wall/CPU spans for the stages of the extraction, and a
+profiled request gets the worker's ``cProfile`` stats back to merge into its
+own profile.
+"""
+
+import cProfile
+import logging
+import multiprocessing
+import os
+import queue
+import resource
+import threading
+import time
+from contextlib import contextmanager
+from io import StringIO
+from multiprocessing.connection import Connection
+from typing import Any, NamedTuple
+
+from yt_dlp import YoutubeDL
+
+INFO_FIELDS = ("id", "title", "ext", "url", "format_id", "filesize_approx")
+FORMAT_FIELDS = ("url", "ext", "format_id", "filesize_approx", "audio_channels")
+
+logger = logging.getLogger(__name__)
+
+
+class Extraction(NamedTuple):
+    info: dict[str, Any] | None
+    cookies: str
+    # name -> (wall ms, cpu ms)
+    spans: dict[str, tuple[float, float]]
+    # cProfile stats of the worker, when asked for
+    stats: dict | None = None
+
+
+class ExtractionError(Exception):
+    def __init__(self, message: str, extraction: Extraction | None = None):
+        super().__init__(message)
+        # spans and stats gathered before the failure, if any
+        self.extraction = extraction
+
+
+class ExtractionTimeout(ExtractionError):
+    pass
+
+
+def compact_info(info: dict[str, Any]) -> dict[str, Any]:
+    result = {key: info[key] for key in INFO_FIELDS if key in info}
+    if "requested_formats" in info:
+        result["requested_formats"] = [
+            {key: fmt[key] for key in FORMAT_FIELDS if key in fmt}
+            for fmt in info["requested_formats"] or []
+        ]
+    return result
+
+
+def rss_mb() -> float:
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except (OSError, ValueError, IndexError):
+        # peak rather than current, close enough to decide on recycling
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+@contextmanager
+def timed(spans: dict[str, tuple[float, float]], name: str):
+    wall, cpu = time.perf_counter(), time.thread_time()
+    try:
+        yield
+    finally:
+        spans[name] = (
+            (time.perf_counter() - wall) * 1000,
+            (time.thread_time() - cpu) * 1000,
+        )
+
+
+def extract(
+    opts: dict[str, Any], query: str, cookies: str, profile: bool = False
+) -> Extraction:
+    """Extract ``query`` and return its compact info and the updated cookie
+    jar, optionally running under ``cProfile``.
+    """
+    profiler = cProfile.Profile() if profile else None
+    spans: dict[str, tuple[float, float]] = {}
+    info, error = None, None
+    if profiler:
+        profiler.enable()
+    try:
+        with timed(spans, "create_extractor"):
+            ydl = YoutubeDL(
+                {**opts, "cookiefile": StringIO(cookies) if cookies else None}
+            )
+        try:
+            with timed(spans, "extract_info"):
+                info = ydl.extract_info(query, download=False, process=True)
+            info = compact_info(info) if info else None
+            with timed(spans, "save_cookies"):
+                jar = StringIO()
+                ydl.cookiejar.save(jar)
+                cookies = jar.getvalue()
+        finally:
+            ydl.close()
+    except Exception as e:
+        error = e
+    finally:
+        if profiler:
+            profiler.disable()
+            profiler.create_stats()
+
+    extraction = Extraction(info, cookies, spans, profiler.stats if profiler else None)
+    if error:
+        raise ExtractionError(str(error), extraction) from error
+    return extraction
+
+
+def _worker_main(conn: Connection):
+    while True:
+        try:
+            job = conn.recv()
+        except EOFError:
+            return
+        if job is None:
+            return
+
+        try:
+            conn.send(("ok", extract(*job), rss_mb()))
+        except ExtractionError as e:
+            conn.send(("error", (str(e), e.extraction), rss_mb()))
+
+
+class ExtractWorker:
+    def __init__(self, context):
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(
+            target=_worker_main, args=(child_conn,), daemon=True
+        )
+        self.process.start()
+        child_conn.close()
+        self.calls = 0
+
+    def run(self, job: tuple, timeout: float) -> tuple:
+        self.calls += 1
+        self.conn.send(job)
+        if not self.conn.poll(timeout):
+            raise ExtractionTimeout(f"Timed out after {timeout}s")
+        return self.conn.recv()
+
+    def close(self):
+        """Let the worker exit after its current job."""
+        try:
+            self.conn.send(None)
+        except OSError:
+            pass
+        self.conn.close()
+
+    def kill(self):
+        self.process.kill()
+        self.process.join(1)
+        self.conn.close()
+
+
+class ExtractPool:
+    def __init__(
+        self,
+        size: int = 2,
+        timeout: float = 30,
+        max_calls: int = 50,
+        max_rss_mb: float = 512,
+    ):
+        self.size = size
+        self.timeout = timeout
+        self.max_calls = max_calls
+        self.max_rss_mb = max_rss_mb
+        self._context = None
+        self._reset()
+
+    def _reset(self):
+        self.pid = os.getpid()
+        self.idle: queue.LifoQueue[ExtractWorker] = queue.LifoQueue()
+        self.slots = threading.BoundedSemaphore(max(self.size, 1))
+
+    @property
+    def context(self):
+        if self._context is None:
+            if "forkserver" in multiprocessing.get_all_start_methods():
+                self._context = multiprocessing.get_context("forkserver")
+                self._context.set_forkserver_preload(["yt_dlp", __name__])
+            else:
+                self._context = multiprocessing.get_context("spawn")
+        return self._context
+
+    def run(
+        self,
+        opts: dict[str, Any],
+        query: str,
+        cookies: str = "",
+        timeout: float | None = None,
+        profile: bool = False,
+    ) -> Extraction:
+        """Extract ``query`` on a pooled worker. Waiting for a free worker and
+        the extraction itself are each bounded by ``timeout``. With
+        ``profile`` the worker runs the extraction under ``cProfile`` and
+        returns its stats.
+        """
+        timeout = timeout or self.timeout
+        if self.size <= 0:
+            # inline, already covered by the caller's profiler
+            return extract(opts, query, cookies)
+
+        if self.pid != os.getpid():
+            # forked: the inherited workers belong to the parent
+            self._reset()
+        wall, cpu = time.perf_counter(), time.thread_time()
+        if not self.slots.acquire(timeout=timeout):
+            raise ExtractionTimeout(f"No extraction worker free after {timeout}s")
+
+        try:
+            try:
+                worker = self.idle.get_nowait()
+            except queue.Empty:
+                worker = ExtractWorker(self.context)
+            # for a free slot, plus starting a worker when none is idle
+            waited = (
+                (time.perf_counter() - wall) * 1000,
+                (time.thread_time() - cpu) * 1000,
+            )
+
+            try:
+                status, result, rss = worker.run(
+                    (opts, query, cookies, profile), timeout
+                )
+            except ExtractionTimeout:
+                logger.warning(
+                    f"Extraction of {query!r} timed out after {timeout}s, "
+                    "killing worker"
+                )
+                worker.kill()
+                raise
+            except (EOFError, OSError) as e:
+                worker.kill()
+                raise ExtractionError(f"Extraction worker died: {e}") from e
+            except Exception as e:
+                # e.g. an unpicklable job, the worker's state is unknown
+                worker.kill()
+                raise ExtractionError(f"Extraction worker call failed: {e}") from e
+
+            if worker.calls >= self.max_calls or rss > self.max_rss_mb:
+                logger.info(
+                    f"Recycling extraction worker after {worker.calls} calls "
+                    f"at {rss:.0f} MB"
+                )
+                worker.close()
+            else:
+                self.idle.put(worker)
+        finally:
+            self.slots.release()
+
+        if status == "error":
+            message, extraction = result
+            raise ExtractionError(
+                message,
+                extraction._replace(spans={"extract_wait": waited, **extraction.spans}),
+            )
+        return result._replace(spans={"extract_wait": waited, **result.spans})
+
+    def shutdown(self):
+        while True:
+            try:
+                self.idle.get_nowait().close()
+            except queue.Empty:
+                return
@@ -0,0 +1,180 @@
+"""Pool of long-lived Node.js processes running scripts/worker.js.
+
+Calls are multiplexed over each worker's stdin/stdout as line-delimited JSON,
+so a warm pool avoids paying Node startup on every request. A call that times
+out kills its worker (it would block everything queued behind it), crashed
+workers are replaced on the next call, and workers are retired after
+``max_calls`` calls to bound heap growth.
+"""
+
+import concurrent.futures
+import itertools
+import json
+import logging
+import os
+import subprocess
+import threading
+from concurrent.futures import Future
+from typing import NamedTuple
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+WORKER_SCRIPT = "scripts/worker.js"
+TIMEOUT_RETURN_CODE = 124
+
+logger = logging.getLogger(__name__)
+
+
+class NodeResult(NamedTuple):
+    returncode: int
+    stdout: str
+    stderr: str
+
+
+class WorkerCrashed(Exception):
+    pass
+
+
+class NodeWorker:
+    def __init__(self, cwd: str):
+        self.process = subprocess.Popen(
+            ["node", WORKER_SCRIPT],
+            cwd=cwd,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            text=True,
+            bufsize=1,
+        )
+        self.pending: dict[int, Future[NodeResult]] = {}
+        self.ids = itertools.count()
+        self.calls = 0
+        self.dead = False
+        self.lock = threading.Lock()
+        threading.Thread(target=self._read, daemon=True).start()
+
+    @property
+    def load(self) -> int:
+        return len(self.pending)
+
+    def _read(self):
+        assert self.process.stdout
+        for line in self.process.stdout:
+            try:
+                message = json.loads(line)
+            except ValueError:
+                logger.warning(f"Node worker sent invalid output: {line!r}")
+                continue
+
+            with self.lock:
+                future = self.pending.pop(message.get("id"), None)
+            if future:
+                future.set_result(
+                    NodeResult(
+                        message.get("code", 1),
+                        message.get("stdout", ""),
+                        message.get("stderr", ""),
+                    )
+                )
+
+        # stdout closed: the worker exited, crashed or was killed
+        self.dead = True
+        code = self.process.wait()
+        with self.lock:
+            pending, self.pending = self.pending, {}
+        for future in pending.values():
+            future.set_exception(WorkerCrashed(f"Node worker exited with {code}"))
+
+    def submit(self, script: str, args: list[str]) -> Future[NodeResult]:
+        assert self.process.stdin
+        future: Future[NodeResult] = Future()
+        with self.lock:
+            if self.dead:
+                raise WorkerCrashed("Node worker is not running")
+
+            request_id = next(self.ids)
+            self.pending[request_id] = future
+            self.calls += 1
+            try:
+                self.process.stdin.write(
+                    json.dumps({"id": request_id, "script": script, "args": args})
+                    + "\n"
+                )
+                self.process.stdin.flush()
+            except OSError as e:
+                self.pending.pop(request_id, None)
+                self.dead = True
+                raise WorkerCrashed(f"Failed to write to Node worker: {e}")
+        return future
+
+    def close(self):
+        """Stop accepting calls, the worker exits once its queue drains."""
+        self.dead = True
+        if self.process.stdin:
+            try:
+                self.process.stdin.close()
+            except OSError:
+                pass
+
+    def kill(self):
+        self.dead = True
+        self.process.kill()
+
+
+class NodePool:
+    def __init__(
+        self,
+        cwd: str = ROOT_DIR,
+        size: int = 2,
+        max_calls: int = 1000,
+        timeout: float = 10,
+    ):
+        self.cwd = cwd
+        self.size = size
+        self.max_calls = max_calls
+        self.timeout = timeout
+        self.workers: list[NodeWorker] = []
+        self.lock = threading.Lock()
+
+    def _acquire(self) -> NodeWorker:
+        with self.lock:
+            workers = []
+            for worker in self.workers:
+                if worker.dead:
+                    logger.warning("Replacing dead Node worker")
+                    continue
+                if worker.calls >= self.max_calls:
+                    worker.close()
+                    continue
+                workers.append(worker)
+
+            while len(workers) < self.size:
+                workers.append(NodeWorker(self.cwd))
+            self.workers = workers
+            return min(workers, key=lambda worker: worker.load)
+
+    def run(self, args: list[str], timeout: float | None = None) -> NodeResult:
+        """Run ``node *args`` on a pooled worker, like ``subprocess.run``."""
+        script, *script_args = args
+        timeout = timeout or self.timeout
+        worker = self._acquire()
+        try:
+            future = worker.submit(script, script_args)
+        except WorkerCrashed as e:
+            # died between being picked and being written to
+            logger.warning(f"{e}, retrying on a new worker")
+            worker = self._acquire()
+            future = worker.submit(script, script_args)
+
+        try:
+            return future.result(timeout)
+        except concurrent.futures.TimeoutError:
+            logger.warning(f"Node call timed out after {timeout}s, killing worker")
+            worker.kill()
+            return NodeResult(TIMEOUT_RETURN_CODE, "", f"Timed out after {timeout}s")
+        except WorkerCrashed as e:
+            return NodeResult(1, "", str(e))
+
+    def shutdown(self):
+        with self.lock:
+            workers, self.workers = self.workers, []
+        for worker in workers:
+            worker.close()
@@ -0,0 +1,203 @@
+"""Opt-in per-request profiling.
+
+A request is profiled when it carries ``X-Profile-Token: $PROFILE_TOKEN`` or
+is picked by ``PROFILE_SAMPLE_RATE``. The whole request, streaming included,
+runs under ``cProfile`` and the result is written to ``PROFILE_DIR`` as a
+standard ``.prof`` file (open it with ``pstats`` or snakeviz). Code can mark
+interesting sections with :func:`span`, whose wall/CPU totals are listed next
+to each profile by the ``/profiles`` endpoint.
+"""
+
+import cProfile
+import hmac
+import os
+import pstats
+import random
+import tempfile
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from typing import Any
+
+from flask import (
+    Flask,
+    Response,
+    abort,
+    g,
+    has_app_context,
+    jsonify,
+    request,
+    send_from_directory,
+)
+
+PROFILE_HEADER = "X-Profile-Token"
+MAX_PROFILES = 100
+
+
+def _current() -> dict[str, Any] | None:
+    return g.get("profile") if has_app_context() else None
+
+
+def profiling() -> bool:
+    """Whether the current request is being profiled."""
+    return _current() is not None
+
+
+def record_span(name: str, wall_ms: float, cpu_ms: float):
+    """Add a span measured elsewhere, e.g. in a worker process."""
+    state = _current()
+    if state is None:
+        return
+
+    totals = state["spans"].setdefault(
+        name, {"count": 0, "wall_ms": 0.0, "cpu_ms": 0.0}
+    )
+    totals["count"] += 1
+    totals["wall_ms"] += wall_ms
+    totals["cpu_ms"] += cpu_ms
+
+
+def add_stats(stats: dict):
+    """Merge ``cProfile`` stats collected in another process into the current
+    request's profile.
+    """
+    state = _current()
+    if state is not None:
+        state["child_stats"].append(stats)
+
+
+@contextmanager
+def span(name: str):
+    """Record wall and CPU time of the block on the current request's profile,
+    if it has one.
+    """
+    if not profiling():
+        yield
+        return
+
+    wall, cpu = time.perf_counter(), time.thread_time()
+    try:
+        yield
+    finally:
+        record_span(
+            name,
+            (time.perf_counter() - wall) * 1000,
+            (time.thread_time() - cpu) * 1000,
+        )
+
+
+class _LoadedStats:
+    """Stats from another process, in the shape ``pstats.Stats`` loads."""
+
+    def __init__(self, stats: dict):
+        self.stats = stats
+
+    def create_stats(self):
+        pass
+
+
+class RequestProfiler:
+    def __init__(self, app: Flask, url_prefix: str = ""):
+        self.app = app
+        self.token = os.getenv("PROFILE_TOKEN", "")
+        self.sample_rate = float(os.getenv("PROFILE_SAMPLE_RATE", 0))
+        self.directory = os.getenv(
+            "PROFILE_DIR", os.path.join(tempfile.gettempdir(), "profiles")
+        )
+        self.recent: deque[dict[str, Any]] = deque(maxlen=MAX_PROFILES)
+        self.lock = threading.Lock()
+        if not self.token and not self.sample_rate:
+            return
+
+        os.makedirs(self.directory, exist_ok=True)
+        app.before_request(self.start)
+        app.after_request(self.stop)
+        app.add_url_rule(url_prefix + "/profiles", "profiles", self.index)
+        app.add_url_rule(url_prefix + "/profiles/<name>", "profile", self.download)
+
+    def authorized(self) -> bool:
+        return bool(self.token) and hmac.compare_digest(
+            request.headers.get(PROFILE_HEADER, ""), self.token
+        )
+
+    def start(self):
+        if request.endpoint in ("profiles", "profile"):
+            return
+        if not self.authorized() and random.random() >= self.sample_rate:
+            return
+
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # another request in this process is already being profiled
+            return
+        g.profile = {
+            "profile": profile,
+            "wall": time.perf_counter(),
+            "cpu": time.thread_time(),
+            "spans": {},
+            "child_stats": [],
+        }
+
+    def stop(self, response: Response) -> Response:
+        # left on g so spans inside streamed bodies still land on it
+        state = g.get("profile")
+        if state is None:
+            return response
+
+        entry = {
+            "method": request.method,
+            "path": request.full_path.rstrip("?"),
+            "status": response.status_code,
+            "created_at": time.time(),
+        }
+        # after the body has been sent, so streaming is part of the profile
+        response.call_on_close(lambda: self.finish(state, entry))
+        return response
+
+    def finish(self, state: dict[str, Any], entry: dict[str, Any]):
+        profile: cProfile.Profile = state["profile"]
+        profile.disable()
+        entry["wall_ms"] = (time.perf_counter() - state["wall"]) * 1000
+        entry["cpu_ms"] = (time.thread_time() - state["cpu"]) * 1000
+        entry["spans"] = state["spans"]
+        entry["name"] = f"{int(entry['created_at'])}-{uuid.uuid4().hex[:8]}.prof"
+        try:
+            stats = pstats.Stats(profile)
+            for child_stats in state["child_stats"]:
+                stats.add(_LoadedStats(child_stats))
+            stats.dump_stats(os.path.join(self.directory, entry["name"]))
+        except OSError as e:
+            self.app.logger.error(f"Failed to write profile: {e}")
+            return
+
+        with self.lock:
+            evicted = self.recent[0] if len(self.recent) == self.recent.maxlen else None
+            self.recent.append(entry)
+        if evicted:
+            # only tracked profiles are kept on disk
+            try:
+                os.remove(os.path.join(self.directory, evicted["name"]))
+            except OSError as e:
+                self.app.logger.warning(f"Failed to remove old profile: {e}")
+        self.app.logger.info(
+            f"Profiled {entry['method']} {entry['path']} in"
+            f" {entry['wall_ms']:.0f} ms, saved as {entry['name']}"
+        )
+
+    def index(self):
+        if not self.authorized():
+            abort(403)
+
+        limit = request.args.get("limit", 20, int)
+        with self.lock:
+            entries = sorted(self.recent, key=lambda e: e["wall_ms"], reverse=True)
+        return jsonify(entries[:limit])
+
+    def download(self, name: str):
+        if not self.authorized():
+            abort(403)
+        return send_from_directory(self.directory, name, as_attachment=True)
@@ -0,0 +1,183 @@
+"""Helpers and process-wide resources shared by the endpoints.
+
+Everything here is safe to import before a preforking server forks: the
+environment and read-only state are set up once at import, while clients
+holding sockets (Redis) are created lazily in each process and dropped in
+forked children.
+"""
+
+import gzip
+import hashlib
+import logging
+import os
+import threading
+from typing import Any, Iterable, MutableSet, NamedTuple
+
+import brotli
+from dotenv import find_dotenv, load_dotenv
+from flask import Flask, Response, current_app, render_template, request
+from upstash_redis import Redis
+from upstash_redis.errors import UpstashError
+
+load_dotenv()
+load_dotenv(find_dotenv(".env.local"))
+
+formatter = logging.Formatter(
+    "[%(asctime)s] [%(levelname)s] in %(module)s: %(message)s"
+)
+logger = logging.getLogger("api")
+if not logger.handlers:
+    _handler = logging.StreamHandler()
+    _handler.setFormatter(formatter)
+    logger.addHandler(_handler)
+    logger.setLevel(logging.INFO)
+
+
+def setup_logging(app: Flask):
+    app.logger.handlers[0].setFormatter(formatter)
+    app.logger.setLevel(logging.INFO if not app.debug else logging.DEBUG)
+
+
+_redis_client: Redis | None = None
+_redis_initialized = False
+_redis_lock = threading.Lock()
+
+
+def get_redis() -> Redis | None:
+    """The process-wide Redis client, created on first use. None when Redis
+    could not be configured.
+    """
+    global _redis_client, _redis_initialized
+    if _redis_initialized:
+        return _redis_client
+
+    with _redis_lock:
+        if not _redis_initialized:
+            try:
+                _redis_client = Redis(
+                    url=os.getenv("KV_REST_API_URL", ""),
+                    token=os.getenv("KV_REST_API_TOKEN", ""),
+                    allow_telemetry=False,
+                )
+                logger.info("Successfully connected to Redis.")
+            except UpstashError as e:
+                logger.critical(
+                    f"Could not connect to Redis: {e}. Caching will be disabled."
+                )
+                _redis_client = None
+            _redis_initialized = True
+    return _redis_client
+
+
+def _reset_after_fork():
+    # the parent's HTTP connection pool must not be shared with children
+    global _redis_client, _redis_initialized, _redis_lock
+    _redis_client = None
+    _redis_initialized = False
+    _redis_lock = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def str_to_bool(value: Any) -> bool:
+    if value is None:
+        return False
+
+    if isinstance(value, bool):
+        return value
+
+    return str(value).lower() in ("yes", "true", "t", "y", "1")
+
+
+class ClassList(MutableSet):
+    """Data structure for holding, and ultimately returning as a single string,
+    a set of identifiers that should be managed like CSS classes.
+    """
+
+    def __init__(self, arg: str | Iterable | None = None, *args: str):
+        """Constructor.
+        :param arg: A single class name or an iterable thereof.
+        """
+        classes: Iterable[str] = []
+        if isinstance(arg, str):
+            classes = arg.split()
+        elif isinstance(arg, Iterable):
+            classes = arg
+        elif arg is not None:
+            raise TypeError("expected a string or string iterable, got %r" % type(arg))
+
+        self.classes = set(filter(None, classes))
+        if args:
+            self.classes.update(args)
+
+    def __contains__(self, class_):
+        return class_ in self.classes
+
+    def __iter__(self):
+        return iter(self.classes)
+
+    def __len__(self):
+        return len(self.classes)
+
+    def add(self, *classes):  # type: ignore
+        for class_ in classes:
+            self.classes.add(class_)
+        return ""
+
+    def discard(self, *classes):  # type: ignore
+        for class_ in classes:
+            self.classes.discard(class_)
+        return ""
+
+    def __str__(self):
+        return " ".join(sorted(self.classes))
+
+    def __html__(self):
+        return 'class="%s"' % self if self else ""
+
+
+class RenderedPage(NamedTuple):
+    version: str
+    etag: str
+    # encoding -> body
+    bodies: dict[str, bytes]
+
+
+# (app name, template) -> page
+rendered_pages: dict[tuple[str, str], RenderedPage] = {}
+
+
+def render_cached(template: str, version: str = "", **context) -> Response:
+    """Render ``template`` once per ``version`` and serve it with a strong
+    ETag, precompressed for gzip and brotli clients.
+    """
+    key = (current_app.name, template)
+    page = rendered_pages.get(key)
+    if page is None or page.version != version or current_app.debug:
+        html = render_template(template, **context).encode("utf-8")
+        page = rendered_pages[key] = RenderedPage(
+            version,
+            hashlib.sha256(html).hexdigest()[:32],
+            {
+                "br": brotli.compress(html, quality=11),
+                "gzip": gzip.compress(html, 9),
+                "identity": html,
+            },
+        )
+
+    encoding = request.accept_encodings.best_match(["br", "gzip"]) or "identity"
+    # strong etags must differ per representation
+    etag = page.etag if encoding == "identity" else f"{page.etag}-{encoding}"
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        response = Response(page.bodies[encoding], mimetype="text/html")
+        if encoding != "identity":
+            response.headers["Content-Encoding"] = encoding
+
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = "no-cache"
+    response.vary.add("Accept-Encoding")
+    return response
@@ -0,0 +1,152 @@
+"""Fingerprinted, precompressed static assets shared by the page endpoints.
+
+Every file in the static folder gets a content-hashed name
+(``styles/global.css`` -> ``styles/global.3f2a9c1d7e4b.css``) and, for text
+assets, ``.br``/``.gz`` variants written once to a build folder. Hashed URLs
+are served with an ``immutable`` one year lifetime; the plain names keep
+working (webpack loads its chunks by plain name) but must be revalidated.
+"""
+
+import gzip
+import hashlib
+import mimetypes
+import os
+import tempfile
+from typing import NamedTuple
+
+import brotli
+from flask import Flask, Response, abort, request, send_file, url_for
+
+IMMUTABLE_MAX_AGE = 31536000
+COMPRESSIBLE_EXTENSIONS = {".js", ".css", ".svg", ".txt", ".json", ".html", ".map"}
+# encoding -> suffix of the precompressed file, in order of preference
+ENCODINGS = {
+    "br": ".br",
+    "gzip": ".gz",
+}
+
+
+class Asset(NamedTuple):
+    path: str
+    mimetype: str
+    # encoding -> path of the precompressed file
+    variants: dict[str, str]
+
+
+# (static folder, build folder) -> the instance that built it, so apps served
+# from one process share a single manifest
+builds: dict[tuple[str, str], "StaticAssets"] = {}
+
+
+class StaticAssets:
+    def __init__(
+        self,
+        app: Flask,
+        url_prefix: str = "/assets",
+        build_folder: str | None = None,
+    ):
+        self.app = app
+        self.static_folder = str(app.static_folder)
+        self.build_folder = build_folder or os.getenv(
+            "STATIC_BUILD_DIR", os.path.join(tempfile.gettempdir(), "static-build")
+        )
+        # logical name -> fingerprinted name
+        self.manifest: dict[str, str] = {}
+        # fingerprinted or logical name -> asset
+        self.assets: dict[str, Asset] = {}
+        self.immutable: set[str] = set()
+
+        key = (os.path.realpath(self.static_folder), self.build_folder)
+        built = builds.get(key)
+        if built:
+            self.manifest, self.assets, self.immutable = (
+                built.manifest,
+                built.assets,
+                built.immutable,
+            )
+        else:
+            self.build()
+            builds[key] = self
+        app.add_url_rule(
+            url_prefix.rstrip("/") + "/<path:filename>",
+            endpoint="assets",
+            view_func=self.serve,
+        )
+        app.add_template_global(self.url, "asset_url")
+
+    def build(self):
+        for root, _, files in os.walk(self.static_folder):
+            for file in files:
+                path = os.path.join(root, file)
+                name = os.path.relpath(path, self.static_folder).replace(os.sep, "/")
+                with open(path, "rb") as f:
+                    data = f.read()
+
+                stem, ext = os.path.splitext(name)
+                hashed = f"{stem}.{hashlib.sha256(data).hexdigest()[:12]}{ext}"
+                asset = Asset(
+                    path,
+                    mimetypes.guess_type(name)[0] or "application/octet-stream",
+                    self._precompress(hashed, data)
+                    if ext in COMPRESSIBLE_EXTENSIONS
+                    else {},
+                )
+                self.manifest[name] = hashed
+                self.assets[name] = self.assets[hashed] = asset
+                self.immutable.add(hashed)
+
+        self.app.logger.info(
+            f"Built static manifest with {len(self.manifest)} assets"
+            f" in {self.build_folder}"
+        )
+
+    def _precompress(self, hashed: str, data: bytes) -> dict[str, str]:
+        variants = {}
+        for encoding, suffix in ENCODINGS.items():
+            target = os.path.join(self.build_folder, hashed + suffix)
+            # the name is content-addressed, an existing file is up to date
+            if not os.path.exists(target):
+                compressed = (
+                    brotli.compress(data, quality=11)
+                    if encoding == "br"
+                    else gzip.compress(data, 9)
+                )
+                if len(compressed) >= len(data):
+                    continue
+                try:
+                    os.makedirs(os.path.dirname(target), exist_ok=True)
+                    fd, tmp_path = tempfile.mkstemp(
+                        dir=os.path.dirname(target), suffix=".part"
+                    )
+                    with os.fdopen(fd, "wb") as f:
+                        f.write(compressed)
+                    os.replace(tmp_path, target)
+                except OSError as e:
+                    self.app.logger.warning(f"Failed to precompress {hashed}: {e}")
+                    continue
+            variants[encoding] = target
+        return variants
+
+    def url(self, filename: str) -> str:
+        return url_for("assets", filename=self.manifest.get(filename, filename))
+
+    def serve(self, filename: str) -> Response:
+        asset = self.assets.get(filename)
+        if not asset:
+            abort(404)
+
+        encoding = request.accept_encodings.best_match(list(asset.variants))
+        response = send_file(
+            asset.variants[encoding] if encoding else asset.path,
+            mimetype=asset.mimetype,
+            max_age=IMMUTABLE_MAX_AGE if filename in self.immutable else 0,
+        )
+        if encoding:
+            response.headers["Content-Encoding"] = encoding
+        if asset.variants:
+            response.vary.add("Accept-Encoding")
+        if filename in self.immutable:
+            response.cache_control.immutable = True
+        else:
+            response.cache_control.no_cache = True
+        return response
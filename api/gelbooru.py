@@ -1,21 +1,41 @@
 from __future__ import annotations
 
+import base64
+import functools
 import hashlib
 import json
-import logging
+import mimetypes
 import os
 import re
-from random import randint
-from typing import TYPE_CHECKING
+import tempfile
+import threading
+import time
+import zipfile
+from array import array
+from collections import OrderedDict
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    Future,
+    ThreadPoolExecutor,
+    as_completed,
+    wait,
+)
+from concurrent.futures import (
+    TimeoutError as FutureTimeoutError,
+)
+from io import BytesIO, RawIOBase
+from random import Random, randint, randrange, sample, shuffle
+from typing import TYPE_CHECKING, NamedTuple
+from urllib.parse import urlencode, urlparse
 
 import requests
-from dotenv import find_dotenv, load_dotenv
-from flask import Flask, Response, request
-from upstash_redis import Redis
+from _shared import get_redis, setup_logging, str_to_bool
+from flask import Flask, Response, g, jsonify, redirect, request, send_file
+from PIL import Image
 from upstash_redis.errors import UpstashError
 
 if TYPE_CHECKING:
-    from typing import Any, Literal
+    from typing import Any, Callable, Iterable, Iterator, Literal
 
     SizeType = Literal[
         "file_url",
@@ -38,33 +58,81 @@ HEADERS = {
     "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/133.0.0.0 Safari/537.36"
 }
 CACHE_TTL = 1800
+CACHE_KEY_VERSION = "v2"
+CACHE_LOCAL_MAX_ITEMS = 1024
+# by serialized size, one large value must not pin the whole tier
+CACHE_LOCAL_MAX_BYTES = 32 * 1024 * 1024
+# refresh in the background once an entry is this far into its ttl
+CACHE_REFRESH_AHEAD = 0.8
+CACHE_SINGLE_FLIGHT_TIMEOUT = 30
+MAX_IMAGE_SIZE_MB = 4
+# a .part file older than this was left by a crashed writer
+IMAGE_CACHE_STALE_PART = 3600
+# shared by all requests, each select_image keeps at most PROBE_WINDOW in flight
+PROBE_WORKERS = 32
+PROBE_WINDOW = 3
+PROBE_TIMEOUT = 10
+GALLERY_WORKERS = 8
+GALLERY_MAX_COUNT = 20
+GALLERY_PAGES = 3
+SEED_MIN_INTERVAL = 10
+SEED_MAX_INTERVAL = 86400
+# a post id always maps to the same image
+POST_CACHE_MAX_AGE = 86400
+# query args that only drive the seeded selection, not the image itself
+SEED_ARGS = ("tags", "limit", "aspect_ratio", "interval", "redirect")
+IMAGE_CHUNK_SIZE = 64 * 1024
+MAX_TRANSFORM_DIMENSION = 4096
+TRANSFORM_QUALITY = 85
+# output format -> file extension
+TRANSFORM_FORMATS = {
+    "jpeg": "jpg",
+    "png": "png",
+    "webp": "webp",
+}
+# source extension -> default output format
+SOURCE_FORMATS = {
+    ".jpg": "jpeg",
+    ".jpeg": "jpeg",
+    ".png": "png",
+    ".webp": "webp",
+    ".gif": "png",
+}
+ASPECT_RATIO_TOLERANCE = 0.1
+# tag index: per-tag metadata of posts, filled in the background
+TAG_INDEX_PAGE_LIMIT = 100
+TAG_INDEX_MAX_PAGES = 20
+TAG_INDEX_WARM_SIZE = 100
+TAG_INDEX_MAX_TAGS = 32
+TAG_INDEX_TTL = 10800
+TAG_INDEX_PICK_ATTEMPTS = 8
+POST_RECORD_KEYS = (
+    "id",
+    "file_url",
+    "sample_url",
+    "preview_url",
+    "width",
+    "height",
+    "sample_width",
+    "sample_height",
+    "preview_width",
+    "preview_height",
+)
 
 
-load_dotenv()
-load_dotenv(find_dotenv(".env.local"))
-
 app = Flask(__name__)
 app.config["SEND_FILE_MAX_AGE_DEFAULT"] = 0
-formatter = logging.Formatter(
-    "[%(asctime)s] [%(levelname)s] in %(module)s: %(message)s"
-)
-app.logger.handlers[0].setFormatter(formatter)
-app.logger.setLevel(logging.INFO if not app.debug else logging.DEBUG)
+setup_logging(app)
 app.config["KV_REST_API_URL"] = os.getenv("KV_REST_API_URL", "")
 app.config["KV_REST_API_TOKEN"] = os.getenv("KV_REST_API_TOKEN", "")
 app.config["GELBOORU_USER_ID"] = os.getenv("GELBOORU_USER_ID", "")
 app.config["GELBOORU_API_KEY"] = os.getenv("GELBOORU_API_KEY", "")
-
-try:
-    redis_client = Redis(
-        url=app.config["KV_REST_API_URL"],
-        token=app.config["KV_REST_API_TOKEN"],
-        allow_telemetry=False,
-    )
-    app.logger.info("Successfully connected to Redis.")
-except UpstashError as e:
-    app.logger.critical(f"Could not connect to Redis: {e}. Caching will be disabled.")
-    redis_client = None
+app.config["IMAGE_CACHE_DIR"] = os.getenv(
+    "IMAGE_CACHE_DIR", os.path.join(tempfile.gettempdir(), "gelbooru-images")
+)
+app.config["IMAGE_CACHE_MAX_BYTES"] = int(
+    os.getenv("IMAGE_CACHE_MAX_BYTES", 256 * 1024 * 1024)
+)
 
 if app.config["GELBOORU_USER_ID"] and app.config["GELBOORU_API_KEY"]:
     API_URL += f"&user_id={app.config['GELBOORU_USER_ID']}&api_key={app.config['GELBOORU_API_KEY']}"
@@ -86,6 +154,230 @@ class FailedToExtractCount(Exception):
     pass
 
 
+class InvalidTransform(Exception):
+    pass
+
+
+class SelectedImage(NamedTuple):
+    post_id: int | None
+    image_size: str
+    url: str
+    # None when the image is already in the disk cache
+    response: requests.Response | None
+
+
+class ImageTransform(NamedTuple):
+    width: int | None
+    height: int | None
+    # target aspect ratio (width / height) to center-crop to
+    crop: float | None
+    format: str | None
+
+    @property
+    def signature(self) -> str:
+        return f"w{self.width or 0}h{self.height or 0}c{self.crop or 0:g}"
+
+
+class ImageCache:
+    """Byte-budgeted LRU of image files on disk, keyed by post id and size
+    variant. Files are written to a ``.part`` file first and renamed into
+    place once complete, so readers never see a partial image.
+
+    Processes sharing the directory (forked wsgi workers) all write to it, so
+    every commit rescans the directory and evicts by mtime, which hits keep
+    current, until the whole directory fits the budget. A miss checks the
+    disk, so a file written by one process is a hit in the others.
+    """
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.entries: OrderedDict[str, int] = OrderedDict()
+        self.total = 0
+        self.lock = threading.Lock()
+        self.enabled = max_bytes > 0
+        if not self.enabled:
+            return
+
+        try:
+            os.makedirs(directory, exist_ok=True)
+            for entry in os.scandir(directory):
+                # only stale ones, another process may be writing the rest
+                if (
+                    entry.name.endswith(".part")
+                    and entry.is_file()
+                    and time.time() - entry.stat().st_mtime > IMAGE_CACHE_STALE_PART
+                ):
+                    os.remove(entry.path)
+        except OSError as e:
+            app.logger.warning(f"Image cache disabled, {directory} unusable: {e}")
+            self.enabled = False
+            return
+
+        self._rescan()
+
+    @staticmethod
+    def key(post_id: int, image_size: str, url: str) -> str:
+        return f"{post_id}-{image_size}{os.path.splitext(urlparse(url).path)[1]}"
+
+    def _adopt(self, key: str) -> bool:
+        """Track a file another process wrote."""
+        if not self.enabled:
+            return False
+        try:
+            size = os.stat(os.path.join(self.directory, key)).st_size
+        except OSError:
+            return False
+
+        with self.lock:
+            if key not in self.entries:
+                self.entries[key] = size
+                self.total += size
+                self._evict()
+            return key in self.entries
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.entries or self._adopt(key)
+
+    def get(self, key: str) -> str | None:
+        if key not in self:
+            return None
+        with self.lock:
+            if key not in self.entries:
+                return None
+            self.entries.move_to_end(key)
+
+        path = os.path.join(self.directory, key)
+        try:
+            # keep recency across restarts
+            os.utime(path)
+        except OSError:
+            self.discard(key)
+            return None
+        return path
+
+    def discard(self, key: str):
+        with self.lock:
+            size = self.entries.pop(key, None)
+            if size is not None:
+                self.total -= size
+
+    def _evict(self):
+        while self.total > self.max_bytes and self.entries:
+            name, size = self.entries.popitem(last=False)
+            self.total -= size
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except OSError:
+                pass
+
+    def _rescan(self):
+        """Reload the entries from the directory, oldest first, and evict down
+        to the budget. Falls back to the files this process knows of when the
+        directory cannot be listed.
+        """
+        files = []
+        try:
+            for entry in os.scandir(self.directory):
+                if entry.name.endswith(".part"):
+                    continue
+                try:
+                    if entry.is_file():
+                        stat = entry.stat()
+                        files.append((stat.st_mtime, entry.name, stat.st_size))
+                except OSError:
+                    # evicted by another process meanwhile
+                    continue
+        except OSError as e:
+            app.logger.warning(f"Failed to scan image cache: {e}")
+            with self.lock:
+                self._evict()
+            return
+
+        with self.lock:
+            self.entries = OrderedDict((name, size) for _, name, size in sorted(files))
+            self.total = sum(self.entries.values())
+            self._evict()
+
+    def _commit(self, key: str, tmp_path: str, size: int):
+        os.replace(tmp_path, os.path.join(self.directory, key))
+        with self.lock:
+            self.total += size - self.entries.pop(key, 0)
+            self.entries[key] = size
+        # other processes add files too, the budget covers all of them
+        self._rescan()
+
+    def put(self, key: str, data: bytes):
+        if not self.enabled:
+            return
+
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".part")
+            with os.fdopen(fd, "wb") as file:
+                file.write(data)
+            self._commit(key, tmp_path, len(data))
+        except OSError as e:
+            app.logger.warning(f"Failed to write image cache file: {e}")
+
+    def tee(
+        self, key: str, chunks: Iterable[bytes], expected_size: int | None = None
+    ) -> Iterator[bytes]:
+        """Yield ``chunks`` unchanged while writing them to the cache. Errors
+        on the disk side never interrupt the stream to the client.
+        """
+        if not self.enabled:
+            yield from chunks
+            return
+
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".part")
+            file = os.fdopen(fd, "wb")
+        except OSError as e:
+            app.logger.warning(f"Failed to open image cache file: {e}")
+            yield from chunks
+            return
+
+        written = 0
+        committed = False
+        try:
+            for chunk in chunks:
+                if file:
+                    try:
+                        file.write(chunk)
+                        written += len(chunk)
+                    except OSError as e:
+                        app.logger.warning(f"Failed to write image cache file: {e}")
+                        file.close()
+                        file = None
+                yield chunk
+
+            if file:
+                file.close()
+                if expected_size is None or written == expected_size:
+                    self._commit(key, tmp_path, written)
+                    committed = True
+        finally:
+            if file:
+                file.close()
+            if not committed:
+                try:
+                    os.remove(tmp_path)
+                except OSError:
+                    pass
+
+
+image_cache = ImageCache(
+    app.config["IMAGE_CACHE_DIR"], app.config["IMAGE_CACHE_MAX_BYTES"]
+)
+probe_executor = ThreadPoolExecutor(
+    max_workers=PROBE_WORKERS, thread_name_prefix="gelbooru-probe"
+)
+# separate from the probe pool, gallery tasks wait on probes
+gallery_executor = ThreadPoolExecutor(
+    max_workers=GALLERY_WORKERS, thread_name_prefix="gelbooru-gallery"
+)
+
+
 def logger_decorator(func):
     def wrapper(*args, **kwargs):
         app.logger.debug(f"Calling {func.__name__} with args: {args}, kwargs: {kwargs}")
@@ -111,62 +403,220 @@ def hashing(value: Any) -> str:
 
 
 def make_cache_key(func, args: tuple[Any], kwargs: dict[str, Any]) -> str:
-    key_parts = [func.__name__] + [hashing(arg) for arg in args]
+    key_parts = [CACHE_KEY_VERSION, func.__name__] + [hashing(arg) for arg in args]
     key_parts += [f"{k}={hashing(v)}" for k, v in kwargs.items()]
     return ":".join(key_parts)
 
 
+class CacheEntry(NamedTuple):
+    value: Any
+    stored_at: float
+    expire: int
+    # serialized size in bytes
+    size: int = 0
+
+    @property
+    def age(self) -> float:
+        return time.time() - self.stored_at
+
+    @property
+    def expired(self) -> bool:
+        return self.age >= self.expire
+
+    @property
+    def stale(self) -> bool:
+        return self.age >= self.expire * CACHE_REFRESH_AHEAD
+
+
+local_cache: OrderedDict[Any, CacheEntry] = OrderedDict()
+local_cache_bytes = 0
+local_cache_lock = threading.Lock()
+# keys currently being computed, for single-flight and refresh-ahead
+inflight: dict[Any, Future] = {}
+inflight_lock = threading.Lock()
+
+
+def _local_get(key: Any) -> CacheEntry | None:
+    global local_cache_bytes
+    with local_cache_lock:
+        entry = local_cache.get(key)
+        if entry is None:
+            return None
+        if entry.expired:
+            del local_cache[key]
+            local_cache_bytes -= entry.size
+            return None
+        local_cache.move_to_end(key)
+        return entry
+
+
+def _local_set(key: Any, entry: CacheEntry):
+    global local_cache_bytes
+    if entry.size > CACHE_LOCAL_MAX_BYTES // 4:
+        return
+
+    with local_cache_lock:
+        previous = local_cache.pop(key, None)
+        if previous:
+            local_cache_bytes -= previous.size
+        local_cache[key] = entry
+        local_cache_bytes += entry.size
+        while (
+            len(local_cache) > CACHE_LOCAL_MAX_ITEMS
+            or local_cache_bytes > CACHE_LOCAL_MAX_BYTES
+        ):
+            _, evicted = local_cache.popitem(last=False)
+            local_cache_bytes -= evicted.size
+
+
+def _claim(key: Any) -> tuple[Future, bool]:
+    """Mark ``key`` as being computed. Returns the future of its result and
+    whether the caller is the one to compute it.
+    """
+    with inflight_lock:
+        future = inflight.get(key)
+        if future is not None:
+            return future, False
+        future = inflight[key] = Future()
+        return future, True
+
+
+def _resolve(key: Any, future: Future, compute: Callable[[], Any]) -> Any:
+    """Run ``compute`` for a claimed ``key`` and hand its result or exception
+    to everyone waiting on ``future``.
+    """
+    try:
+        result = compute()
+    except BaseException as e:
+        future.set_exception(e)
+        raise
+    else:
+        future.set_result(result)
+        return result
+    finally:
+        with inflight_lock:
+            inflight.pop(key, None)
+
+
 def cache(
     _type: type[str | int | bytes | bool | dict | list] = str, expire: int = CACHE_TTL
 ):
-    def decorator(func):
-        def wrapper(*args, **kwargs):
-            if not redis_client:
-                return func(*args, **kwargs)
+    """Cache the result in-process and in Redis.
 
-            cache_key = make_cache_key(func, args, kwargs)
-            cached_result = redis_client.get(cache_key)
-            if cached_result:
-                app.logger.info(f"Cache hit for {cache_key}")
-                return _deserialize_cached_result(cached_result, _type)
+    Concurrent misses for the same arguments share one call, and entries
+    past ``CACHE_REFRESH_AHEAD`` of their ttl are served while being
+    recomputed in the background.
+    """
 
+    def decorator(func):
+        def compute(key: Any, remote_key: str | None, args, kwargs):
             result = func(*args, **kwargs)
-            redis_client.set(cache_key, _serialize_result(result), ex=expire)
+            if result is None:
+                return result
+
+            entry = CacheEntry(result, time.time(), expire)
+            serialized = _serialize_result(entry, _type)
+            _local_set(key, entry._replace(size=len(serialized)))
+            redis_client = get_redis()
+            if redis_client and remote_key:
+                try:
+                    redis_client.set(remote_key, serialized, ex=expire)
+                except UpstashError as e:
+                    app.logger.error(f"Redis cache set failed for {remote_key}: {e}")
             return result
 
-        return wrapper
+        def refresh(key: Any, remote_key: str | None, args, kwargs):
+            future, claimed = _claim(key)
+            if not claimed:
+                return
 
-    return decorator
+            def run():
+                try:
+                    _resolve(
+                        key, future, lambda: compute(key, remote_key, args, kwargs)
+                    )
+                    app.logger.info(f"Refreshed cache for {remote_key or key}")
+                except Exception as e:
+                    app.logger.warning(f"Cache refresh failed for {remote_key}: {e}")
+
+            threading.Thread(target=run, daemon=True).start()
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            key: Any = (func.__name__, args, tuple(sorted(kwargs.items())))
+            try:
+                hash(key)
+            except TypeError:
+                key = make_cache_key(func, args, kwargs)
+
+            redis_client = get_redis()
+            remote_key = None
+            entry = _local_get(key)
+            if entry is None and redis_client:
+                remote_key = make_cache_key(func, args, kwargs)
+                try:
+                    cached_result = redis_client.get(remote_key)
+                except UpstashError as e:
+                    app.logger.error(f"Redis cache get failed for {remote_key}: {e}")
+                    cached_result = None
+                if cached_result:
+                    entry = _deserialize_cached_result(cached_result, _type, expire)
+                    if entry and not entry.expired:
+                        app.logger.info(f"Cache hit for {remote_key}")
+                        _local_set(key, entry)
+                    else:
+                        entry = None
+
+            if entry is not None:
+                if entry.stale:
+                    if redis_client and not remote_key:
+                        remote_key = make_cache_key(func, args, kwargs)
+                    refresh(key, remote_key, args, kwargs)
+                return entry.value
+
+            future, claimed = _claim(key)
+            if claimed:
+                return _resolve(
+                    key, future, lambda: compute(key, remote_key, args, kwargs)
+                )
+
+            # someone else is computing it, share their result or error
+            try:
+                return future.result(CACHE_SINGLE_FLIGHT_TIMEOUT)
+            except FutureTimeoutError:
+                app.logger.warning(f"Gave up waiting on {remote_key or key}")
+            return compute(key, remote_key, args, kwargs)
 
+        return wrapper
 
-def _serialize_result(result: Any) -> str:
-    if isinstance(result, bytes):
-        return result.decode("utf-8", errors="surrogateescape")
-    if isinstance(result, (dict, list)):
-        return json.dumps(result)
-    return str(result)
+    return decorator
 
 
-def _deserialize_cached_result(cached_result: str, _type: type) -> Any:
+def _serialize_result(entry: CacheEntry, _type: type) -> str:
+    value = entry.value
     if _type is bytes:
-        return cached_result.encode("utf-8")
-    if _type is int:
-        return int(cached_result)
-    if _type is bool:
-        return str_to_bool(cached_result)
-    if _type in {dict, list}:
-        return json.loads(cached_result)
-    return cached_result
-
-
-def str_to_bool(value: str | bool | None) -> bool:
-    if value is None:
-        return False
+        value = base64.b64encode(value).decode("ascii")
+    return json.dumps(
+        {"type": _type.__name__, "value": value, "stored_at": entry.stored_at},
+        separators=(",", ":"),
+    )
 
-    if isinstance(value, bool):
-        return value
 
-    return value.lower() in ("yes", "true", "t", "y", "1")
+def _deserialize_cached_result(
+    cached_result: str, _type: type, expire: int
+) -> CacheEntry | None:
+    try:
+        data = json.loads(cached_result)
+        if data["type"] != _type.__name__:
+            return None
+        value = data["value"]
+        if _type is bytes:
+            value = base64.b64decode(value)
+        elif not isinstance(value, _type):
+            return None
+        return CacheEntry(value, float(data["stored_at"]), expire, len(cached_result))
+    except (ValueError, KeyError, TypeError):
+        return None
 
 
 @logger_decorator
@@ -195,27 +645,73 @@ def is_fit_aspect_ratio(
     if not width or not height:
         return False
 
-    return abs((width / height) - aspect_ratio) < 0.1
+    return abs((width / height) - aspect_ratio) < ASPECT_RATIO_TOLERANCE
+
 
+def probe_image(
+    url: str, cancelled: threading.Event
+) -> tuple[bool, requests.Response | None]:
+    """Check if the image at ``url`` is reachable and small enough, without
+    downloading its body. Falls back to a streamed GET when HEAD is refused or
+    gives no Content-Length, and returns that open response when it fits so it
+    can be served without a second request.
+    """
+    if cancelled.is_set():
+        return False, None
 
-def select_image(data: dict, aspect_ratio: float | None = None) -> requests.Response:
+    try:
+        response = requests.head(
+            url, headers=HEADERS, timeout=PROBE_TIMEOUT, allow_redirects=True
+        )
+        if response.ok and "Content-Length" in response.headers:
+            return is_fit_response_size(response) < MAX_IMAGE_SIZE_MB, None
+
+        if cancelled.is_set():
+            return False, None
+
+        response = requests.get(
+            url, headers=HEADERS, stream=True, timeout=PROBE_TIMEOUT
+        )
+    except requests.RequestException as e:
+        app.logger.warning(f"Probe failed for {url}: {e}")
+        return False, None
+
+    if response.ok and is_fit_response_size(response) < MAX_IMAGE_SIZE_MB:
+        return True, response
+    response.close()
+    return False, None
+
+
+def close_probe_response(probe: Future[tuple[bool, requests.Response | None]]):
+    if probe.cancelled() or probe.exception():
+        return
+    _, response = probe.result()
+    if response is not None:
+        response.close()
+
+
+def select_image(
+    data: dict,
+    aspect_ratio: float | None = None,
+    prefer_size: str | None = None,
+    open_body: bool = True,
+) -> SelectedImage:
     image_sizes = dict.fromkeys(
         [
-            request.args.get("prefer_size", "file_url"),
+            prefer_size or request.args.get("prefer_size", "file_url"),
             "file_url",
             "sample_url",
             "preview_url",
         ]
     )
 
-    post: dict | None = None
-    response = None
+    # candidates in preference order: posts first, then sizes within a post
+    candidates: list[tuple[int | None, str, str]] = []
     for post in data.get("post", []):
         if not post:
             continue
 
         for image_size in image_sizes:
-            app.logger.info(f"Trying {image_size} for post {post.get('id')}")
             url = post.get(image_size)
             if not url or not isinstance(url, str):
                 continue
@@ -226,26 +722,85 @@ def select_image(data: dict, aspect_ratio: float | None = None) -> requests.Resp
                 app.logger.info(f"Aspect ratio not fit for post {post.get('id')}")
                 break
 
-            response = requests.get(url, stream=True)
-            if response.ok and is_fit_response_size(response) < 4:
-                app.logger.info(f"Selected {image_size} for post {post.get('id')}")
-                return response
+            candidates.append((post.get("id"), image_size, url))
 
-        else:
-            response.close() if response else None
+    # cached candidates need no probe, they were accepted before, and nothing
+    # after the first one is ever reached
+    cached = [
+        post_id is not None and ImageCache.key(post_id, image_size, url) in image_cache
+        for post_id, image_size, url in candidates
+    ]
+    if True in cached:
+        candidates = candidates[: cached.index(True) + 1]
+
+    # probed ahead in preference order, at most PROBE_WINDOW at a time so one
+    # request cannot hold up the probes of the others
+    cancelled = threading.Event()
+    probes: dict[int, Future[tuple[bool, requests.Response | None]]] = {}
+    submitted = 0
+    try:
+        for index, (post_id, image_size, url) in enumerate(candidates):
+            app.logger.info(f"Trying {image_size} for post {post_id}")
+            if cached[index]:
+                app.logger.info(f"Cache hit for {image_size} of post {post_id}")
+                return SelectedImage(post_id, image_size, url, None)
+
+            while submitted < len(candidates) and len(probes) < PROBE_WINDOW:
+                if not cached[submitted]:
+                    probes[submitted] = probe_executor.submit(
+                        probe_image, candidates[submitted][2], cancelled
+                    )
+                submitted += 1
+
+            fits, response = probes.pop(index).result()
+            if not fits:
+                continue
+            if not open_body:
+                # metadata only, the caller never reads the image
+                if response is not None:
+                    response.close()
+                return SelectedImage(post_id, image_size, url, None)
+            if response is not None:
+                app.logger.info(f"Selected {image_size} for post {post_id}")
+                return SelectedImage(post_id, image_size, url, response)
+
+            try:
+                response = requests.get(
+                    url, headers=HEADERS, stream=True, timeout=PROBE_TIMEOUT
+                )
+            except requests.RequestException as e:
+                app.logger.warning(
+                    f"Failed to get {image_size} for post {post_id}: {e}"
+                )
+                continue
+
+            if response.ok:
+                app.logger.info(f"Selected {image_size} for post {post_id}")
+                return SelectedImage(post_id, image_size, url, response)
+            response.close()
+    finally:
+        cancelled.set()
+        for probe in probes.values():
+            probe.cancel()
+            # a probe still running may yet return an open response
+            probe.add_done_callback(close_probe_response)
 
     raise NoImageFound
 
 
-# only use for api call and json return for caching. also 3hrs
-@cache(dict, expire=10800)
-def api_get(url: str) -> dict | None:
+def api_request(url: str) -> dict | None:
     response = requests.get(url, headers=HEADERS)
     response.raise_for_status()
     return response.json()
 
 
-def get_image(url: str, aspect_ratio: float | None = None) -> requests.Response:
+# only use for api call and json return for caching. also 3hrs
+@cache(dict, expire=10800)
+def api_get(url: str) -> dict | None:
+    return api_request(url)
+
+
+def fetch_posts(url: str) -> dict:
     try:
         data = api_get(url)
     except requests.RequestException as e:
@@ -255,10 +810,14 @@ def get_image(url: str, aspect_ratio: float | None = None) -> requests.Response:
     if not data:
         raise RequestToAPIFailed
 
-    if not data or not data.get("post"):
+    if not data.get("post"):
         raise NoImageFound
 
-    return select_image(data, aspect_ratio=aspect_ratio)
+    return data
+
+
+def get_image(url: str, aspect_ratio: float | None = None) -> SelectedImage:
+    return select_image(fetch_posts(url), aspect_ratio=aspect_ratio)
 
 
 @cache(int)
@@ -277,11 +836,167 @@ def get_tags_count(tags: str) -> int:
     raise FailedToExtractCount
 
 
+def _aspect_bucket(ratio: float) -> int:
+    return int(ratio / ASPECT_RATIO_TOLERANCE)
+
+
+class TagIndex:
+    """Local index of post metadata for a single tag query.
+
+    Post ids are kept in compact ``array`` buckets keyed by the aspect ratio
+    of the original file, so picking a random (matching) post never needs an
+    API call once the index is warm.
+    """
+
+    def __init__(self, tags: str):
+        self.tags = tags
+        self.posts: dict[int, dict] = {}
+        self.ids = array("L")
+        self.buckets: dict[int, array] = {}
+        self.created_at = time.monotonic()
+        self.complete = False
+        self.filling = False
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.ids)
+
+    @property
+    def expired(self) -> bool:
+        return time.monotonic() - self.created_at > TAG_INDEX_TTL
+
+    @property
+    def warm(self) -> bool:
+        return self.complete or len(self.ids) >= TAG_INDEX_WARM_SIZE
+
+    def ingest(self, posts: list[dict]):
+        with self.lock:
+            for post in posts:
+                post_id = post.get("id") if post else None
+                if not isinstance(post_id, int) or post_id in self.posts:
+                    continue
+
+                self.posts[post_id] = {
+                    k: post[k] for k in POST_RECORD_KEYS if post.get(k) is not None
+                }
+                self.ids.append(post_id)
+
+                width, height = post.get("width"), post.get("height")
+                if width and height:
+                    self.buckets.setdefault(
+                        _aspect_bucket(width / height), array("L")
+                    ).append(post_id)
+
+    def pick(self, aspect_ratio: float | None = None) -> dict | None:
+        with self.lock:
+            if not aspect_ratio:
+                if not self.ids:
+                    return None
+                return self.posts[self.ids[randrange(len(self.ids))]]
+
+            candidates = [
+                self.buckets[bucket]
+                for bucket in range(
+                    _aspect_bucket(aspect_ratio - ASPECT_RATIO_TOLERANCE),
+                    _aspect_bucket(aspect_ratio + ASPECT_RATIO_TOLERANCE) + 1,
+                )
+                if bucket in self.buckets
+            ]
+            total = sum(len(bucket) for bucket in candidates)
+            if not total:
+                return None
+
+            # the outer buckets only partially match, so sample a few times
+            # before falling back to a full scan of the candidates
+            for _ in range(TAG_INDEX_PICK_ATTEMPTS):
+                n = randrange(total)
+                for bucket in candidates:
+                    if n < len(bucket):
+                        post = self.posts[bucket[n]]
+                        break
+                    n -= len(bucket)
+                if is_fit_aspect_ratio(post, aspect_ratio=aspect_ratio):
+                    return post
+
+            matches = [
+                self.posts[post_id]
+                for bucket in candidates
+                for post_id in bucket
+                if is_fit_aspect_ratio(self.posts[post_id], aspect_ratio=aspect_ratio)
+            ]
+            return matches[randrange(len(matches))] if matches else None
+
+
+tag_indexes: OrderedDict[str, TagIndex] = OrderedDict()
+tag_indexes_lock = threading.Lock()
+
+
+def get_tag_index(tags: str) -> TagIndex:
+    with tag_indexes_lock:
+        index = tag_indexes.get(tags)
+        if index is None or (index.expired and not index.filling):
+            index = tag_indexes[tags] = TagIndex(tags)
+        tag_indexes.move_to_end(tags)
+        while len(tag_indexes) > TAG_INDEX_MAX_TAGS:
+            tag_indexes.popitem(last=False)
+        return index
+
+
+def fill_tag_index(index: TagIndex):
+    try:
+        pages = -(-get_tags_count(index.tags) // TAG_INDEX_PAGE_LIMIT)
+        pids = list(range(pages))
+        # random pages so a capped index is still an unbiased sample
+        shuffle(pids)
+        for pid in pids[:TAG_INDEX_MAX_PAGES]:
+            # uncached, the index itself is the cache for these pages
+            data = api_request(
+                API_URL.format(TAG_INDEX_PAGE_LIMIT, index.tags) + f"&pid={pid}"
+            )
+            if not data or not data.get("post"):
+                break
+            index.ingest(data["post"])
+        else:
+            index.complete = pages <= TAG_INDEX_MAX_PAGES
+        app.logger.info(
+            f"Indexed {len(index)} posts for {index.tags} (complete: {index.complete})"
+        )
+    except (requests.RequestException, FailedToExtractCount) as e:
+        app.logger.warning(f"Failed to fill tag index for {index.tags}: {e}")
+    finally:
+        index.filling = False
+
+
+def schedule_tag_index_fill(index: TagIndex):
+    with index.lock:
+        if index.filling or index.complete:
+            return
+        index.filling = True
+
+    threading.Thread(target=fill_tag_index, args=(index,), daemon=True).start()
+
+
 def get_random_image(
     tags: str,
     limit: int = 5,
     aspect_ratio: float | None = None,
-) -> requests.Response | None:
+) -> SelectedImage | None:
+    index = get_tag_index(tags)
+    if index.warm:
+        for _ in range(5):
+            post = index.pick(aspect_ratio)
+            if not post:
+                if index.complete:
+                    raise NoImageFound
+                break
+            try:
+                return select_image({"post": [post]}, aspect_ratio=aspect_ratio)
+            except NoImageFound:
+                continue
+        app.logger.info(f"Tag index for {tags} had no usable post, using the API")
+    else:
+        schedule_tag_index_fill(index)
+
     for _ in range(5):
         try:
             # pid == offset
@@ -290,7 +1005,9 @@ def get_random_image(
                 API_URL.format(limit, tags)
                 + f"&pid={randint(0, get_tags_count(tags) // limit)}"
             )
-            return get_image(url, aspect_ratio=aspect_ratio)
+            data = fetch_posts(url)
+            index.ingest(data["post"])
+            return select_image(data, aspect_ratio=aspect_ratio)
         except NoImageFound:
             if aspect_ratio:
                 app.logger.warning(
@@ -305,20 +1022,175 @@ def get_random_image(
 @app.after_request
 def add_header(r: Response):
     """
-    Force cache to be disabled.
+    Force cache to be disabled, unless the view marked the response cacheable.
     """
+    if g.get("cacheable"):
+        return r
+
     r.headers["Cache-Control"] = "no-store, no-cache, must-revalidate"
     r.headers["Pragma"] = "no-cache"
     r.headers["Expires"] = "0"
     return r
 
 
-def generate_response(url: str, response: requests.Response | None = None):
-    if response:
-        image_response = response
-    else:
+def parse_transform() -> ImageTransform | None:
+    width = request.args.get("width", None, int)
+    height = request.args.get("height", None, int)
+    crop = request.args.get("crop", None, float)
+    format = request.args.get("format", None)
+    if width is None and height is None and crop is None and not format:
+        return None
+
+    for name, value in (("width", width), ("height", height)):
+        if value is not None and not 0 < value <= MAX_TRANSFORM_DIMENSION:
+            raise InvalidTransform(
+                f"Invalid {name}, must be between 1 and {MAX_TRANSFORM_DIMENSION}"
+            )
+
+    if crop is not None and crop <= 0:
+        raise InvalidTransform("Invalid crop, must be a positive aspect ratio")
+
+    if format:
+        format = "jpeg" if format.lower() == "jpg" else format.lower()
+        if format not in TRANSFORM_FORMATS:
+            raise InvalidTransform(
+                f"Invalid format, must be one of {', '.join(TRANSFORM_FORMATS)}"
+            )
+
+    return ImageTransform(width, height, crop, format)
+
+
+def transform_image(data: bytes, transform: ImageTransform, format: str) -> bytes:
+    with Image.open(BytesIO(data)) as img:
+        if transform.crop:
+            width, height = img.size
+            if width / height > transform.crop:
+                new_width = round(height * transform.crop)
+                left = (width - new_width) // 2
+                img = img.crop((left, 0, left + new_width, height))
+            else:
+                new_height = round(width / transform.crop)
+                top = (height - new_height) // 2
+                img = img.crop((0, top, width, top + new_height))
+
+        # thumbnail keeps the aspect ratio, never upscales and lets JPEG
+        # decode at a reduced scale
+        img.thumbnail(
+            (
+                transform.width or MAX_TRANSFORM_DIMENSION,
+                transform.height or MAX_TRANSFORM_DIMENSION,
+            ),
+            Image.Resampling.LANCZOS,
+        )
+
+        if format == "jpeg" and img.mode not in ("RGB", "L"):
+            img = img.convert("RGB")
+        elif img.mode not in ("RGB", "RGBA", "L", "LA", "P"):
+            img = img.convert("RGBA")
+
+        output = BytesIO()
+        img.save(output, format=format, quality=TRANSFORM_QUALITY, optimize=True)
+        return output.getvalue()
+
+
+def read_image(image: SelectedImage, cache_key: str | None) -> bytes:
+    path = image_cache.get(cache_key) if cache_key else None
+    if path:
+        with open(path, "rb") as file:
+            return file.read()
+
+    image_response = image.response or requests.get(
+        image.url, headers=HEADERS, stream=True, timeout=PROBE_TIMEOUT
+    )
+    try:
+        image_response.raise_for_status()
+        chunks = image_response.iter_content(IMAGE_CHUNK_SIZE)
+        if cache_key:
+            content_length = image_response.headers.get("Content-Length")
+            chunks = image_cache.tee(
+                cache_key,
+                chunks,
+                int(content_length)
+                if content_length and content_length.isdigit()
+                else None,
+            )
+        return b"".join(chunks)
+    finally:
+        image_response.close()
+
+
+def transformed_format(image: SelectedImage, transform: ImageTransform) -> str | None:
+    source_format = SOURCE_FORMATS.get(
+        os.path.splitext(urlparse(image.url).path)[1].lower()
+    )
+    if not source_format:
+        return None
+    return transform.format or source_format
+
+
+def transformed_cache_key(
+    image: SelectedImage, transform: ImageTransform, format: str
+) -> str | None:
+    if image.post_id is None:
+        return None
+    return (
+        f"{image.post_id}-{image.image_size}-{transform.signature}"
+        f".{TRANSFORM_FORMATS[format]}"
+    )
+
+
+def generate_transformed_response(
+    image: SelectedImage, cache_key: str | None, transform: ImageTransform
+):
+    format = transformed_format(image, transform)
+    if not format:
+        if image.response is not None:
+            image.response.close()
+        return "Cannot transform this post", 400
+
+    transformed_key = transformed_cache_key(image, transform, format)
+    path = image_cache.get(transformed_key) if transformed_key else None
+    if path:
+        if image.response is not None:
+            image.response.close()
+        return send_file(path, mimetype=f"image/{format}")
+
+    try:
+        data = transform_image(read_image(image, cache_key), transform, format)
+    except requests.RequestException:
+        return "Failed to get image", 500
+    except (OSError, ValueError, Image.DecompressionBombError) as e:
+        app.logger.error(f"Failed to transform post {image.post_id}: {e}")
+        return "Failed to transform image", 500
+
+    if transformed_key:
+        image_cache.put(transformed_key, data)
+    return Response(data, mimetype=f"image/{format}")
+
+
+def generate_response(image: SelectedImage, transform: ImageTransform | None = None):
+    cache_key = (
+        ImageCache.key(image.post_id, image.image_size, image.url)
+        if image.post_id is not None
+        else None
+    )
+    if transform:
+        return generate_transformed_response(image, cache_key, transform)
+
+    image_response = image.response
+    if image_response is None:
+        path = image_cache.get(cache_key) if cache_key else None
+        if path:
+            return send_file(
+                path,
+                mimetype=mimetypes.guess_type(path)[0] or "application/octet-stream",
+            )
+
+        # evicted since it was selected
         try:
-            image_response = requests.get(url, headers=HEADERS, stream=True)
+            image_response = requests.get(
+                image.url, headers=HEADERS, stream=True, timeout=PROBE_TIMEOUT
+            )
         except requests.RequestException:
             return "Failed to get image", 500
         if not image_response.ok:
@@ -329,23 +1201,287 @@ def generate_response(url: str, response: requests.Response | None = None):
         if header in image_response.headers:
             response_headers[header] = image_response.headers[header]
 
+    content_length = image_response.headers.get("Content-Length")
+    chunks = image_response.iter_content(IMAGE_CHUNK_SIZE)
+    if cache_key:
+        chunks = image_cache.tee(
+            cache_key,
+            chunks,
+            int(content_length)
+            if content_length and content_length.isdigit()
+            else None,
+        )
+
     def generate():
-        for chunk in image_response.iter_content(2048):
-            yield chunk
-        image_response.close()
+        try:
+            yield from chunks
+        finally:
+            image_response.close()
 
     return Response(generate(), headers=response_headers)
 
 
+def collect_posts(
+    tags: str, count: int, limit: int, aspect_ratio: float | None = None
+) -> list[dict]:
+    """Distinct random posts for ``tags``, from the tag index when it is warm
+    and otherwise from a few random pages fetched concurrently.
+    """
+    posts: dict[int, dict] = {}
+    index = get_tag_index(tags)
+    if index.warm:
+        for _ in range(count * TAG_INDEX_PICK_ATTEMPTS):
+            post = index.pick(aspect_ratio)
+            if not post:
+                break
+            posts.setdefault(post["id"], post)
+            if len(posts) >= count:
+                break
+        if len(posts) >= count or index.complete:
+            return list(posts.values())
+    else:
+        schedule_tag_index_fill(index)
+
+    pages = get_tags_count(tags) // limit + 1
+    futures = [
+        gallery_executor.submit(
+            fetch_posts, API_URL.format(limit, tags) + f"&pid={pid}"
+        )
+        for pid in sample(range(pages), min(pages, GALLERY_PAGES))
+    ]
+    for future in futures:
+        try:
+            data = future.result()
+        except NoImageFound:
+            continue
+
+        index.ingest(data["post"])
+        for post in data["post"]:
+            if (
+                post
+                and isinstance(post.get("id"), int)
+                and is_fit_aspect_ratio(post, aspect_ratio=aspect_ratio)
+            ):
+                posts.setdefault(post["id"], post)
+
+    candidates = list(posts.values())
+    shuffle(candidates)
+    return candidates
+
+
+def select_images(
+    posts: list[dict],
+    count: int,
+    aspect_ratio: float | None = None,
+    prefer_size: str | None = None,
+    open_body: bool = True,
+) -> list[SelectedImage]:
+    """Select an image for up to ``count`` of ``posts`` concurrently, moving
+    on to the next post whenever one has no usable image.
+    """
+    pending = iter(posts)
+    futures: set[Future[SelectedImage]] = set()
+
+    def submit_next():
+        post = next(pending, None)
+        if post:
+            futures.add(
+                gallery_executor.submit(
+                    select_image,
+                    {"post": [post]},
+                    aspect_ratio=aspect_ratio,
+                    prefer_size=prefer_size,
+                    open_body=open_body,
+                )
+            )
+
+    for _ in range(count):
+        submit_next()
+
+    selected: list[SelectedImage] = []
+    while futures:
+        done, futures = wait(futures, return_when=FIRST_COMPLETED)
+        for future in done:
+            try:
+                selected.append(future.result())
+            except NoImageFound:
+                submit_next()
+
+    return selected
+
+
+def load_image(
+    image: SelectedImage, transform: ImageTransform | None = None
+) -> tuple[str, bytes]:
+    cache_key = ImageCache.key(image.post_id or 0, image.image_size, image.url)
+    format = transformed_format(image, transform) if transform else None
+    if not transform or not format:
+        return cache_key, read_image(image, cache_key)
+
+    transformed_key = transformed_cache_key(image, transform, format) or cache_key
+    path = image_cache.get(transformed_key)
+    if path:
+        if image.response is not None:
+            image.response.close()
+        with open(path, "rb") as file:
+            return transformed_key, file.read()
+
+    data = transform_image(read_image(image, cache_key), transform, format)
+    image_cache.put(transformed_key, data)
+    return transformed_key, data
+
+
+class ZipStream(RawIOBase):
+    """Write-only, unseekable buffer that ``zipfile`` can stream into."""
+
+    def __init__(self):
+        self.chunks: list[bytes] = []
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        self.chunks.append(bytes(b))
+        return len(b)
+
+    def drain(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks.clear()
+        return data
+
+
+def generate_gallery_zip(
+    images: list[SelectedImage], transform: ImageTransform | None = None
+):
+    futures = [
+        gallery_executor.submit(load_image, image, transform) for image in images
+    ]
+    stream = ZipStream()
+    # images are already compressed
+    with zipfile.ZipFile(stream, "w", zipfile.ZIP_STORED) as archive:
+        for future in as_completed(futures):
+            try:
+                name, data = future.result()
+            except (
+                requests.RequestException,
+                OSError,
+                ValueError,
+                Image.DecompressionBombError,
+            ) as e:
+                app.logger.error(f"Failed to add image to gallery: {e}")
+                continue
+
+            archive.writestr(name, data)
+            yield stream.drain()
+    yield stream.drain()
+
+
+def make_cacheable(response: Response, etag: str, max_age: int) -> Response:
+    g.cacheable = True
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = f"public, max-age={max_age}, s-maxage={max_age}"
+    return response
+
+
+def not_modified(etag: str, max_age: int) -> Response | None:
+    if request.if_none_match.contains(etag):
+        return make_cacheable(Response(status=304), etag, max_age)
+    return None
+
+
+def seeded_post(
+    tags: str, limit: int, bucket: int, aspect_ratio: float | None = None
+) -> dict:
+    """Pick a post deterministically for (tags, aspect_ratio, bucket), so every
+    instance agrees on it for the whole bucket.
+    """
+    rng = Random(hashlib.sha256(f"{tags}:{aspect_ratio}:{bucket}".encode()).digest())
+    pages = get_tags_count(tags) // limit
+    for _ in range(5):
+        try:
+            data = fetch_posts(
+                API_URL.format(limit, tags) + f"&pid={rng.randint(0, pages)}"
+            )
+        except NoImageFound:
+            continue
+
+        posts = sorted(
+            (
+                post
+                for post in data["post"]
+                if post
+                and isinstance(post.get("id"), int)
+                and is_fit_aspect_ratio(post, aspect_ratio=aspect_ratio)
+            ),
+            key=lambda post: post["id"],
+        )
+        if posts:
+            return rng.choice(posts)
+
+    raise NoImageFound
+
+
+def seeded_response(
+    tags: str,
+    limit: int,
+    interval: int,
+    aspect_ratio: float | None = None,
+    transform: ImageTransform | None = None,
+):
+    if not SEED_MIN_INTERVAL <= interval <= SEED_MAX_INTERVAL:
+        return (
+            f"Invalid interval, must be between {SEED_MIN_INTERVAL}"
+            f" and {SEED_MAX_INTERVAL}",
+            400,
+        )
+
+    now = time.time()
+    bucket = int(now // interval)
+    max_age = max(int((bucket + 1) * interval - now), 1)
+
+    # the pick is fixed by the arguments and the bucket, so revalidation is
+    # answered without touching upstream
+    etag = hashlib.md5(f"{bucket}:{request.query_string.decode()}".encode()).hexdigest()
+    response = not_modified(etag, max_age)
+    if response:
+        return response
+
+    post = seeded_post(tags, limit, bucket, aspect_ratio=aspect_ratio)
+
+    if str_to_bool(request.args.get("redirect", "true")):
+        args = {k: v for k, v in request.args.items() if k not in SEED_ARGS}
+        args["id"] = post["id"]
+        return make_cacheable(
+            redirect(f"{PREFIX}/post?{urlencode(args)}"), etag, max_age
+        )
+
+    response = generate_response(
+        select_image({"post": [post]}, aspect_ratio=aspect_ratio), transform
+    )
+    if not isinstance(response, Response):
+        return response
+    return make_cacheable(response, etag, max_age)
+
+
 @app.route(PREFIX)
 def index():
     tags = request.args.get("tags", DEFAULT_TAGS)
     limit = request.args.get("limit", 5, int)
     aspect_ratio = request.args.get("aspect_ratio", None, float)
+    try:
+        transform = parse_transform()
+    except InvalidTransform as e:
+        return str(e), 400
 
+    interval = request.args.get("interval", None, int)
     try:
-        resp = get_random_image(tags, limit, aspect_ratio=aspect_ratio)
-        if not resp:
+        if interval is not None:
+            return seeded_response(
+                tags, limit, interval, aspect_ratio=aspect_ratio, transform=transform
+            )
+
+        image = get_random_image(tags, limit, aspect_ratio=aspect_ratio)
+        if not image:
             return "No image found", 404
     except NoImageFound:
         return "No image found", 404
@@ -355,11 +1491,71 @@ def index():
         return "Failed to extract image count", 500
 
     if not str_to_bool(request.args.get("proxy", "false")):
-        return generate_response(resp.url, response=resp)
+        return generate_response(image, transform)
 
     return "Undefined error", 500
 
 
+@app.route(PREFIX + "/gallery")
+def gallery():
+    tags = request.args.get("tags", DEFAULT_TAGS)
+    count = request.args.get("count", 5, int)
+    limit = request.args.get("limit", TAG_INDEX_PAGE_LIMIT, int)
+    aspect_ratio = request.args.get("aspect_ratio", None, float)
+    output = request.args.get("output", "json")
+    if not 0 < count <= GALLERY_MAX_COUNT:
+        return f"Invalid count, must be between 1 and {GALLERY_MAX_COUNT}", 400
+    # gelbooru caps a page at TAG_INDEX_PAGE_LIMIT posts
+    if not 0 < limit <= TAG_INDEX_PAGE_LIMIT:
+        return f"Invalid limit, must be between 1 and {TAG_INDEX_PAGE_LIMIT}", 400
+    if output not in ("json", "zip"):
+        return "Invalid output, must be json or zip", 400
+
+    try:
+        transform = parse_transform()
+    except InvalidTransform as e:
+        return str(e), 400
+
+    try:
+        posts = collect_posts(tags, count, limit, aspect_ratio=aspect_ratio)
+    except NoImageFound:
+        return "No image found", 404
+    except RequestToAPIFailed:
+        return "Failed to get image", 500
+    except FailedToExtractCount:
+        return "Failed to extract image count", 500
+
+    images = select_images(
+        posts,
+        count,
+        aspect_ratio=aspect_ratio,
+        prefer_size=request.args.get("prefer_size", "file_url"),
+        open_body=output == "zip",
+    )
+    if not images:
+        return "No image found", 404
+
+    if output == "zip":
+        return Response(
+            generate_gallery_zip(images, transform),
+            mimetype="application/zip",
+            headers={"Content-Disposition": 'attachment; filename="gallery.zip"'},
+        )
+
+    return jsonify(
+        [
+            {
+                "id": image.post_id,
+                "size": image.image_size,
+                "url": image.url,
+                "proxy_url": f"{PREFIX}/post?id={image.post_id}"
+                f"&prefer_size={image.image_size}",
+            }
+            for image in images
+        ]
+    )
+
+
 @app.route(PREFIX + "/post")
 def post():
     id = request.args.get("id")
@@ -367,10 +1563,20 @@ def post():
         return "No id provided", 400
 
     try:
-        resp = get_image(
+        transform = parse_transform()
+    except InvalidTransform as e:
+        return str(e), 400
+
+    etag = hashlib.md5(request.query_string).hexdigest()
+    response = not_modified(etag, POST_CACHE_MAX_AGE)
+    if response:
+        return response
+
+    try:
+        image = get_image(
             f"https://gelbooru.com/index.php?page=dapi&s=post&q=index&json=1&id={id}"
         )
-        if not resp:
+        if not image:
             return "No image found", 404
     except NoImageFound:
         return "No image found", 404
@@ -380,7 +1586,10 @@ def post():
         return "Failed to extract image count", 500
 
     if not str_to_bool(request.args.get("proxy", "false")):
-        return generate_response(resp.url, response=resp)
+        response = generate_response(image, transform)
+        if not isinstance(response, Response):
+            return response
+        return make_cacheable(response, etag, POST_CACHE_MAX_AGE)
 
     return "Undefined error", 500
 
@@ -1,9 +1,18 @@
 import json
 import os
-import subprocess
 from http.server import BaseHTTPRequestHandler
 from urllib.parse import parse_qs, urlparse
 
+from _node_pool import NodePool
+
+# kept warm across invocations of the same function instance
+node_pool = NodePool(
+    cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    size=int(os.getenv("NODE_POOL_SIZE", 2)),
+    max_calls=int(os.getenv("NODE_POOL_MAX_CALLS", 1000)),
+    timeout=float(os.getenv("NODE_CALL_TIMEOUT", 10)),
+)
+
 
 class handler(BaseHTTPRequestHandler):
     def do_GET(self):
@@ -17,12 +26,7 @@ class handler(BaseHTTPRequestHandler):
             message = query_params.get("message", ["Demo from Python to Node.js!"])[0]
 
             # Call the Node.js script with the message
-            result = subprocess.run(
-                ["node", "scripts/test.js", message],
-                capture_output=True,
-                text=True,
-                cwd=os.path.dirname(os.path.dirname(__file__)),  # Go up to project root
-            )
+            result = node_pool.run(["scripts/test.js", message])
 
             # Set response headers
             self.send_response(200)
@@ -101,12 +105,7 @@ class handler(BaseHTTPRequestHandler):
                 message = "Invalid JSON in POST request"
 
             # Call Node.js with the message
-            result = subprocess.run(
-                ["node", "scripts/test.js", message],
-                capture_output=True,
-                text=True,
-                cwd=os.path.dirname(os.path.dirname(__file__)),
-            )
+            result = node_pool.run(["scripts/test.js", message])
 
             self.send_response(200)
             self.send_header("Content-Type", "application/json")
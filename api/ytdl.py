@@ -1,25 +1,31 @@
+import base64
+import functools
+import hashlib
 import json
-import logging
 import os
+import tempfile
+import threading
+import time
 import uuid
+from collections import OrderedDict
 from io import StringIO
 from pathlib import Path
-from typing import Any, Iterable, MutableSet, cast
+from typing import cast
 
 import requests
-from dotenv import find_dotenv, load_dotenv
+from _extract_pool import Extraction, ExtractionError, ExtractionTimeout, ExtractPool
+from _profiling import RequestProfiler, add_stats, profiling, record_span, span
+from _shared import ClassList, get_redis, render_cached, setup_logging, str_to_bool
+from _static import StaticAssets
+from cryptography.fernet import Fernet, InvalidToken
 from flask import (
     Flask,
     Response,
     jsonify,
-    render_template,
     request,
     stream_with_context,
 )
-from upstash_redis import Redis
 from upstash_redis.errors import UpstashError
-from yt_dlp import YoutubeDL
-from yt_dlp.utils import DownloadError
 
 MAX_RESPONSE_SIZE = 1024 * 1024 * 4
 RANGE_CHUNK_SIZE = 1024 * 1024 * 3
@@ -28,27 +34,50 @@ MAX_DOWNLOAD_FILESIZE = "200M"
 PREFIX = "/api/ytdl"
 RESPONSE_CACHE_TTL_SECONDS = 7200
 URL_CACHE_TTL_SECONDS = 1800
+# a cached /check response must not outlive the download ids inside it
+CHECK_CACHE_TTL_SECONDS = min(RESPONSE_CACHE_TTL_SECONDS, URL_CACHE_TTL_SECONDS)
+# hot /check responses are re-extracted in the last part of their lifetime
+REFRESH_AHEAD_FRACTION = 0.2
+REFRESH_INTERVAL_SECONDS = 30
+REFRESH_MIN_HITS = 3
+REFRESH_MAX_TRACKED = 1000
 CHANGELOG_CACHE_TTL_SECONDS = 3600
-
-load_dotenv()
-load_dotenv(find_dotenv(".env.local"))
+# how long a worker reuses the changelog before asking Redis again
+CHANGELOG_LOCAL_TTL_SECONDS = 60
+DOWNLOAD_TOKEN_CACHE_SIZE = 1024
 
 app = Flask(
     __name__,
     template_folder=Path(__file__).parent.parent / "templates",
     static_folder=Path(__file__).parent.parent / "static",
 )
-
-formatter = logging.Formatter(
-    "[%(asctime)s] [%(levelname)s] in %(module)s: %(message)s"
-)
-app.logger.handlers[0].setFormatter(formatter)
-app.logger.setLevel(logging.INFO if not app.debug else logging.DEBUG)
+app.add_template_global(ClassList, "classlist")
+assets = StaticAssets(app, url_prefix=PREFIX + "/assets")
+setup_logging(app)
+# no-op unless PROFILE_TOKEN or PROFILE_SAMPLE_RATE is set
+profiler = RequestProfiler(app, url_prefix=PREFIX)
 
 app.config["KV_REST_API_URL"] = os.getenv("KV_REST_API_URL", "")
 app.config["KV_REST_API_TOKEN"] = os.getenv("KV_REST_API_TOKEN", "")
 app.config["GITHUB_REPO"] = os.getenv("GITHUB_REPO", "")
 app.config["GITHUB_TOKEN"] = os.getenv("GITHUB_TOKEN", "")
+# when set, download ids are self-contained tokens instead of Redis keys
+app.config["DOWNLOAD_TOKEN_SECRET"] = os.getenv("DOWNLOAD_TOKEN_SECRET", "")
+# concurrent refresh-ahead extractions, 0 disables refreshing
+app.config["CHECK_REFRESH_CONCURRENCY"] = int(os.getenv("CHECK_REFRESH_CONCURRENCY", 1))
+# extraction worker processes, 0 runs extraction in the request thread. off
+# on vercel, where each cold instance would start a forkserver and a worker
+# for a single request
+app.config["EXTRACT_POOL_SIZE"] = int(
+    os.getenv(
+        "EXTRACT_POOL_SIZE", 0 if os.getenv("VERCEL") else min(4, os.cpu_count() or 1)
+    )
+)
+app.config["EXTRACT_TIMEOUT"] = float(os.getenv("EXTRACT_TIMEOUT", 30))
+app.config["EXTRACT_WORKER_MAX_CALLS"] = int(os.getenv("EXTRACT_WORKER_MAX_CALLS", 50))
+app.config["EXTRACT_WORKER_MAX_RSS_MB"] = float(
+    os.getenv("EXTRACT_WORKER_MAX_RSS_MB", 512)
+)
 app.config["YTDL_OPTS"] = {
     "color": "no_color",
     "outtmpl": r"downloads/%(extractor)s-%(id)s-%(title)s.%(ext)s",
@@ -66,42 +95,55 @@ app.config["YTDL_OPTS"] = {
         }
     },
 }
-
-try:
-    redis_client = Redis(
-        url=app.config["KV_REST_API_URL"],
-        token=app.config["KV_REST_API_TOKEN"],
-        allow_telemetry=False,
-    )
-    app.logger.info("Successfully connected to Redis.")
-except UpstashError as e:
-    app.logger.critical(
-        f"Could not connect to Redis: {e}. Caching and cookie persistence will be disabled."
-    )
-    redis_client = None
+# /check only reads a few fields of the selected formats, skip fetching and
+# building everything else
+app.config["YTDL_LEAN_OPTS"] = {
+    "check_formats": False,
+    # keep the parsed player js between extractions, $HOME is read-only on vercel
+    "cachedir": os.path.join(tempfile.gettempdir(), "yt-dlp"),
+    "extractor_args": {
+        # hls/dash manifests stay, lean must not change which format is selected
+        "youtube": {"skip": ["translated_subs"]},
+    },
+}
 
 
 class CookiesIOWrapper(StringIO):
-    def __init__(self, redis_client: Redis | None, key: str = "ytdl_cookies"):
-        self.redis_client = redis_client
+    """Cookie jar file persisted in Redis, loaded on first use in each process."""
+
+    def __init__(self, key: str = "ytdl_cookies"):
         self.key = key
-        initial_value = ""
-        if self.redis_client:
-            try:
-                cookies_result = cast(str | None, self.redis_client.get(self.key))
-                if cookies_result:
-                    initial_value = cookies_result
-                    app.logger.info("Successfully loaded cookies from Redis.")
-            except UpstashError as e:
-                app.logger.error(
-                    f"Redis GET error: {e}. Proceeding without persistent cookies."
-                )
-        super().__init__(initial_value)
+        self.loaded = False
+        super().__init__()
+
+    def load(self):
+        if self.loaded:
+            return
+
+        self.loaded = True
+        redis_client = get_redis()
+        if not redis_client:
+            return
+
+        try:
+            with span("kv"):
+                cookies_result = cast(str | None, redis_client.get(self.key))
+            if cookies_result:
+                self.seek(0)
+                self.truncate()
+                self.write(cookies_result)
+                app.logger.info("Successfully loaded cookies from Redis.")
+        except UpstashError as e:
+            app.logger.error(
+                f"Redis GET error: {e}. Proceeding without persistent cookies."
+            )
 
     def close(self):
-        if self.redis_client:
+        redis_client = get_redis()
+        if redis_client:
             try:
-                self.redis_client.set(self.key, self.getvalue())
+                with span("kv"):
+                    redis_client.set(self.key, self.getvalue())
                 app.logger.info("Successfully saved cookies to Redis.")
             except UpstashError as e:
                 app.logger.error(
@@ -110,60 +152,40 @@ class CookiesIOWrapper(StringIO):
         super().close()
 
 
-cookies_io = CookiesIOWrapper(redis_client)
-app.config["YTDL_OPTS"]["cookiefile"] = cookies_io
-
-
-@app.template_global("classlist")
-class ClassList(MutableSet):
-    def __init__(self, arg: str | Iterable | None = None, *args: str):
-        classes: Iterable[str] = []
-        if isinstance(arg, str):
-            classes = arg.split()
-        elif isinstance(arg, Iterable):
-            classes = arg
-        elif arg is not None:
-            raise TypeError("expected a string or string iterable")
-        self.classes = set(filter(None, classes))
-        if args:
-            self.classes.update(args)
-
-    def __contains__(self, class_):
-        return class_ in self.classes
-
-    def __iter__(self):
-        return iter(self.classes)
-
-    def __len__(self):
-        return len(self.classes)
-
-    def add(self, *classes):  # type: ignore
-        for class_ in classes:
-            self.classes.add(class_)
-        return ""
-
-    def discard(self, *classes):  # type: ignore
-        for class_ in classes:
-            self.classes.discard(class_)
-        return ""
-
-    def __str__(self):
-        return " ".join(sorted(self.classes))
-
-    def __html__(self):
-        return 'class="%s"' % self if self else ""
-
+cookies_io = CookiesIOWrapper()
+# processes are only started on the first extraction
+extract_pool = ExtractPool(
+    size=app.config["EXTRACT_POOL_SIZE"],
+    timeout=app.config["EXTRACT_TIMEOUT"],
+    max_calls=app.config["EXTRACT_WORKER_MAX_CALLS"],
+    max_rss_mb=app.config["EXTRACT_WORKER_MAX_RSS_MB"],
+)
 
-def str_to_bool(value: Any) -> bool:
-    if isinstance(value, bool):
-        return value
-    return str(value).lower() in ("yes", "true", "t", "y", "1")
+download_fernet = (
+    Fernet(
+        base64.urlsafe_b64encode(
+            hashlib.sha256(app.config["DOWNLOAD_TOKEN_SECRET"].encode()).digest()
+        )
+    )
+    if app.config["DOWNLOAD_TOKEN_SECRET"]
+    else None
+)
 
 
-def create_ytdl_extractor(
-    provider: str = "youtube", search_amount: int = 5, extra_opts: dict | None = None
-) -> YoutubeDL:
+def build_ytdl_opts(
+    provider: str = "youtube",
+    search_amount: int = 5,
+    extra_opts: dict | None = None,
+    lean: bool = False,
+) -> dict:
     base_opts = app.config["YTDL_OPTS"].copy()
+    if lean:
+        lean_opts = app.config["YTDL_LEAN_OPTS"]
+        base_opts.update(lean_opts)
+        base_opts["extractor_args"] = {
+            **app.config["YTDL_OPTS"]["extractor_args"],
+            **lean_opts["extractor_args"],
+        }
     config = {**base_opts, **(extra_opts or {})}
     search_prefixes = {
         "soundcloud": f"scsearch{search_amount}",
@@ -172,8 +194,40 @@ def create_ytdl_extractor(
     config["default_search"] = search_prefixes.get(provider, f"ytsearch{search_amount}")
     if provider == "ytmusic":
         config["playlist_items"] = f"1-{search_amount}"
-    cookies_io.seek(0)
-    return YoutubeDL(config)
+    return config
+
+
+def record_extraction(extraction: Extraction | None):
+    if not extraction:
+        return
+    for name, (wall_ms, cpu_ms) in extraction.spans.items():
+        record_span(name, wall_ms, cpu_ms)
+    if extraction.stats:
+        add_stats(extraction.stats)
+
+
+def extract_info(query: str, **kwargs) -> dict | None:
+    """Extract ``query`` on the worker pool, carrying the cookie jar to the
+    worker and back. Returns the compact info from ``compact_info``.
+    """
+    cookies_io.load()
+    cookies = cookies_io.getvalue()
+    try:
+        # the whole round trip; the worker reports its own breakdown
+        with span("extract"):
+            result = extract_pool.run(
+                build_ytdl_opts(**kwargs), query, cookies, profile=profiling()
+            )
+    except ExtractionError as e:
+        record_extraction(e.extraction)
+        raise
+    record_extraction(result)
+
+    if result.cookies and result.cookies != cookies:
+        cookies_io.seek(0)
+        cookies_io.truncate()
+        cookies_io.write(result.cookies)
+    return result.info
 
 
 def create_error_response(
@@ -190,7 +244,24 @@ def create_error_response(
     return jsonify({"success": False, "error": message}), code
 
 
-def get_changelog_data():
+changelog_memo: tuple[float, list] | None = None
+
+
+def get_changelog_data() -> list:
+    global changelog_memo
+    if (
+        changelog_memo
+        and time.monotonic() - changelog_memo[0] < CHANGELOG_LOCAL_TTL_SECONDS
+    ):
+        return changelog_memo[1]
+
+    changelog = _fetch_changelog_data()
+    changelog_memo = (time.monotonic(), changelog)
+    return changelog
+
+
+def _fetch_changelog_data() -> list:
+    redis_client = get_redis()
     if (
         not redis_client
         or not app.config["GITHUB_REPO"]
@@ -201,7 +272,8 @@ def get_changelog_data():
 
     cache_key = "ytdl:changelog"
     try:
-        cached_changelog = redis_client.get(cache_key)
+        with span("kv"):
+            cached_changelog = redis_client.get(cache_key)
         if cached_changelog:
             app.logger.info("Changelog HIT from cache.")
             return json.loads(cached_changelog)
@@ -217,9 +289,10 @@ def get_changelog_data():
     app.logger.info(f"Fetching changelog from URL: {url}")
 
     try:
-        response = requests.get(url, headers=headers, timeout=10)
-        response.raise_for_status()
-        prs = response.json()
+        with span("github"):
+            response = requests.get(url, headers=headers, timeout=10)
+            response.raise_for_status()
+            prs = response.json()
 
         changelog = []
         for pr in prs:
@@ -235,9 +308,10 @@ def get_changelog_data():
                     }
                 )
 
-        redis_client.set(
-            cache_key, json.dumps(changelog), ex=CHANGELOG_CACHE_TTL_SECONDS
-        )
+        with span("kv"):
+            redis_client.set(
+                cache_key, json.dumps(changelog), ex=CHANGELOG_CACHE_TTL_SECONDS
+            )
         app.logger.info("Successfully fetched and cached changelog from GitHub.")
         return changelog
     except requests.exceptions.RequestException as e:
@@ -245,6 +319,49 @@ def get_changelog_data():
         return []
 
 
+def issue_download_id(url: str, ext: str, format_id: str) -> str:
+    """Return an id for /download: an encrypted, authenticated token carrying
+    the upstream url when a token secret is configured, otherwise a short key
+    for the url stored in Redis.
+    """
+    if download_fernet:
+        payload = {"url": url, "ext": ext, "format_id": format_id}
+        return download_fernet.encrypt(
+            json.dumps(payload, separators=(",", ":")).encode("utf-8")
+        ).decode("ascii")
+
+    uid = uuid.uuid4().hex[:12]
+    redis_client = get_redis()
+    if redis_client:
+        with span("kv"):
+            redis_client.set(f"ytdl:url:{uid}", url, ex=URL_CACHE_TTL_SECONDS)
+    return uid
+
+
+@functools.lru_cache(maxsize=DOWNLOAD_TOKEN_CACHE_SIZE)
+def _decode_download_token(token: str) -> tuple[dict, int] | None:
+    if not download_fernet:
+        return None
+    try:
+        payload = download_fernet.decrypt(token)
+        issued_at = download_fernet.extract_timestamp(token)
+    except InvalidToken:
+        return None
+    return json.loads(payload), issued_at
+
+
+def resolve_download_token(token: str) -> str | None:
+    decoded = _decode_download_token(token)
+    if not decoded:
+        return None
+
+    payload, issued_at = decoded
+    # checked here rather than by decrypt(ttl=...) since decoding is cached
+    if time.time() - issued_at > URL_CACHE_TTL_SECONDS:
+        return None
+    return payload["url"]
+
+
 @app.before_request
 def log_request_info():
     app.logger.info(f"Request: {request.method} {request.path}")
@@ -255,52 +372,47 @@ def log_request_info():
 @app.route(PREFIX + "/")
 def index():
     changelog_data = get_changelog_data()
-    return render_template("index.jinja2", changelog=changelog_data)
+    version = hashlib.md5(
+        json.dumps(changelog_data, sort_keys=True).encode("utf-8")
+    ).hexdigest()
+    return render_cached("index.jinja2", version, changelog=changelog_data)
 
 
-@app.route(PREFIX + "/check", methods=["POST"])
-def check():
-    data = cast(dict | None, request.get_json(silent=True))
-    if not data:
-        return create_error_response("Invalid JSON payload.", 400)
-    query = data.get("query")
-    if not query:
-        return create_error_response("Missing required argument: query", 400)
+class CheckError(Exception):
+    def __init__(self, message: str, code: int = 500):
+        super().__init__(message)
+        self.code = code
 
-    cache_key = None
-    if redis_client:
-        try:
-            cache_key = f"ytdl:cache:{query}:{data.get('type')}:{data.get('has_ffmpeg')}:{data.get('format')}"
-            cached_response = redis_client.get(cache_key)
-            if cached_response and isinstance(cached_response, str):
-                app.logger.info(f"Cache HIT for key: {cache_key}")
-                return jsonify(json.loads(cached_response))
-            app.logger.info(f"Cache MISS for key: {cache_key}")
-        except UpstashError as e:
-            app.logger.error(
-                f"Redis cache check failed: {e}. Proceeding without cache."
-            )
 
+def check_cache_key(params: dict) -> str:
+    return f"ytdl:cache:{params['query']}:{params.get('type')}:{params.get('has_ffmpeg')}:{params.get('format')}"
+
+
+def build_check_response(params: dict) -> dict:
+    """Extract ``params["query"]`` and build the /check response for it.
+    Raises ``CheckError`` carrying the status code to answer with.
+    """
     try:
         format_selector = _build_check_format_string(
-            req_type=data.get("type", "video"),
-            has_ffmpeg=str_to_bool(data.get("has_ffmpeg", False)),
-            custom_format=data.get("format", ""),
+            req_type=params.get("type", "video"),
+            has_ffmpeg=str_to_bool(params.get("has_ffmpeg", False)),
+            custom_format=params.get("format", ""),
         )
     except ValueError as e:
-        return create_error_response(str(e), 400, exc=e)
+        raise CheckError(str(e), 400) from e
 
-    extractor = create_ytdl_extractor(
-        extra_opts={"noplaylist": True, "format": format_selector}
-    )
     try:
-        info = extractor.extract_info(query, download=False, process=True)
-        if not info:
-            return create_error_response(
-                "yt-dlp failed to extract info (returned None).", 500
-            )
-    except DownloadError as e:
-        return create_error_response(f"Extraction failed: {e}", 500, exc=e)
+        info = extract_info(
+            params["query"],
+            extra_opts={"noplaylist": True, "format": format_selector},
+            lean=True,
+        )
+    except ExtractionTimeout as e:
+        raise CheckError(f"Extraction timed out: {e}", 504) from e
+    except ExtractionError as e:
+        raise CheckError(f"Extraction failed: {e}", 500) from e
+    if not info:
+        raise CheckError("yt-dlp failed to extract info (returned None).", 500)
 
     ret_data = {
         "title": info.get("title", info.get("id", "")),
@@ -311,12 +423,11 @@ def check():
         ret_data["needFFmpeg"] = True
         req_formats = []
         for i in info.get("requested_formats", []):
-            uid = uuid.uuid4().hex[:12]
-            if redis_client:
-                redis_client.set(f"ytdl:url:{uid}", i["url"], ex=URL_CACHE_TTL_SECONDS)
             req_formats.append(
                 {
-                    "id": uid,
+                    "id": issue_download_id(
+                        i["url"], i["ext"], i.get("format_id", "0")
+                    ),
                     "ext": i["ext"],
                     "formatId": i.get("format_id", "0"),
                     "fileSizeApprox": i.get("filesize_approx", 0),
@@ -328,19 +439,16 @@ def check():
     else:
         url = info.get("url")
         if not url:
-            return create_error_response(
-                "No downloadable URL found for the selected format.", 404
-            )
+            raise CheckError("No downloadable URL found for the selected format.", 404)
 
-        uid = uuid.uuid4().hex[:12]
-        if redis_client:
-            redis_client.set(f"ytdl:url:{uid}", url, ex=URL_CACHE_TTL_SECONDS)
-        ret_data["id"] = uid
+        ret_data["id"] = issue_download_id(
+            url, info.get("ext", "bin"), info.get("format_id", "0")
+        )
         ret_data["isPart"] = True
         ret_data["fileSizeApprox"] = info.get("filesize_approx", 0)
 
-        if data.get("type") == "audio":
-            target_ext = data.get("format")
+        if params.get("type") == "audio":
+            target_ext = params.get("format")
             actual_ext = info.get("ext")
             if target_ext and target_ext != "custom" and target_ext != actual_ext:
                 ret_data["needsConversion"] = True
@@ -350,14 +458,194 @@ def check():
                     f"Audio conversion needed: from '{actual_ext}' to '{target_ext}'"
                 )
 
-    if redis_client and cache_key:
-        try:
+    return ret_data
+
+
+def cache_check_response(cache_key: str, params: dict, ret_data: dict):
+    redis_client = get_redis()
+    if not redis_client:
+        return
+
+    try:
+        with span("kv"):
             redis_client.set(
-                cache_key, json.dumps(ret_data), ex=RESPONSE_CACHE_TTL_SECONDS
+                cache_key, json.dumps(ret_data), ex=CHECK_CACHE_TTL_SECONDS
             )
-            app.logger.info(f"Successfully cached response for key: {cache_key}")
+        app.logger.info(f"Successfully cached response for key: {cache_key}")
+    except UpstashError as e:
+        app.logger.error(f"Redis cache set failed: {e}")
+        return
+    check_refresher.stored(cache_key, params)
+
+
+class HotQuery:
+    __slots__ = ("params", "hits", "expires_at")
+
+    def __init__(self, params: dict):
+        self.params = params
+        # hits during the current lifetime of the cached response
+        self.hits = 0
+        # None until known, for responses cached by another instance
+        self.expires_at: float | None = None
+
+
+class CheckRefresher:
+    """Re-extracts hot /check responses shortly before they expire.
+
+    Cache hits are counted per key over the lifetime of its cached response.
+    Every ``REFRESH_INTERVAL_SECONDS`` a background thread picks the keys with
+    at least ``REFRESH_MIN_HITS`` hits that are in the last
+    ``REFRESH_AHEAD_FRACTION`` of their lifetime and re-extracts the hottest
+    of them, at most ``concurrency`` at a time. Keys that stop being hit
+    simply expire. On serverless hosts the thread only runs while the
+    instance is handling requests.
+    """
+
+    def __init__(self, concurrency: int):
+        self.concurrency = concurrency
+        self._reset()
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=self._reset)
+
+    def _reset(self):
+        self.entries: OrderedDict[str, HotQuery] = OrderedDict()
+        self.refreshing: set[str] = set()
+        self.lock = threading.Lock()
+        self.slots = threading.BoundedSemaphore(max(self.concurrency, 1))
+        self.started = False
+
+    def _track(self, cache_key: str, params: dict) -> HotQuery:
+        entry = self.entries.get(cache_key)
+        if entry is None:
+            entry = self.entries[cache_key] = HotQuery(params)
+            while len(self.entries) > REFRESH_MAX_TRACKED:
+                self.entries.popitem(last=False)
+        self.entries.move_to_end(cache_key)
+        return entry
+
+    def hit(self, cache_key: str, params: dict):
+        if self.concurrency <= 0:
+            return
+
+        with self.lock:
+            self._track(cache_key, params).hits += 1
+            if self.started:
+                return
+            self.started = True
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def stored(self, cache_key: str, params: dict):
+        if self.concurrency <= 0:
+            return
+
+        with self.lock:
+            entry = self._track(cache_key, params)
+            entry.hits = 0
+            entry.expires_at = time.time() + CHECK_CACHE_TTL_SECONDS
+
+    def _run(self):
+        while True:
+            time.sleep(REFRESH_INTERVAL_SECONDS)
+            try:
+                self.tick()
+            except Exception as e:
+                app.logger.error(f"Check refresh tick failed: {e}", exc_info=e)
+
+    def tick(self):
+        now = time.time()
+        with self.lock:
+            for key, entry in list(self.entries.items()):
+                expired = entry.expires_at is not None and entry.expires_at <= now
+                if expired and key not in self.refreshing:
+                    del self.entries[key]
+            candidates = [
+                (key, entry)
+                for key, entry in self.entries.items()
+                if entry.hits >= REFRESH_MIN_HITS and key not in self.refreshing
+            ]
+
+        redis_client = get_redis()
+        due = []
+        for key, entry in candidates:
+            if entry.expires_at is None:
+                if not redis_client:
+                    continue
+                try:
+                    ttl = cast(int, redis_client.ttl(key))
+                except UpstashError as e:
+                    app.logger.error(f"Redis TTL check failed for {key}: {e}")
+                    continue
+                entry.expires_at = now + max(ttl, 0)
+            if (
+                entry.expires_at - now
+                <= CHECK_CACHE_TTL_SECONDS * REFRESH_AHEAD_FRACTION
+            ):
+                due.append((key, entry))
+
+        due.sort(key=lambda item: item[1].hits, reverse=True)
+        for key, entry in due:
+            if not self.slots.acquire(blocking=False):
+                break
+            with self.lock:
+                self.refreshing.add(key)
+            threading.Thread(
+                target=self._refresh, args=(key, entry.params), daemon=True
+            ).start()
+
+    def _refresh(self, cache_key: str, params: dict):
+        try:
+            cache_check_response(cache_key, params, build_check_response(params))
+            app.logger.info(f"Refreshed {cache_key} ahead of expiry")
+        except (CheckError, UpstashError) as e:
+            app.logger.warning(f"Refresh of {cache_key} failed: {e}")
+            with self.lock:
+                self.entries.pop(cache_key, None)
+        finally:
+            with self.lock:
+                self.refreshing.discard(cache_key)
+            self.slots.release()
+
+
+check_refresher = CheckRefresher(app.config["CHECK_REFRESH_CONCURRENCY"])
+
+
+@app.route(PREFIX + "/check", methods=["POST"])
+def check():
+    data = cast(dict | None, request.get_json(silent=True))
+    if not data:
+        return create_error_response("Invalid JSON payload.", 400)
+    query = data.get("query")
+    if not query:
+        return create_error_response("Missing required argument: query", 400)
+
+    params = {key: data.get(key) for key in ("query", "type", "has_ffmpeg", "format")}
+    params = {key: value for key, value in params.items() if value is not None}
+    redis_client = get_redis()
+    cache_key = None
+    if redis_client:
+        try:
+            cache_key = check_cache_key(params)
+            with span("kv"):
+                cached_response = redis_client.get(cache_key)
+            if cached_response and isinstance(cached_response, str):
+                app.logger.info(f"Cache HIT for key: {cache_key}")
+                check_refresher.hit(cache_key, params)
+                return jsonify(json.loads(cached_response))
+            app.logger.info(f"Cache MISS for key: {cache_key}")
         except UpstashError as e:
-            app.logger.error(f"Redis cache set failed: {e}")
+            app.logger.error(
+                f"Redis cache check failed: {e}. Proceeding without cache."
+            )
+
+    try:
+        ret_data = build_check_response(params)
+    except CheckError as e:
+        return create_error_response(
+            str(e), e.code, exc=cast(Exception | None, e.__cause__)
+        )
+
+    if cache_key:
+        cache_check_response(cache_key, params, ret_data)
 
     return jsonify(ret_data)
 
@@ -368,17 +656,24 @@ def download():
     if not uid:
         return create_error_response("Missing required argument: id", 400)
     url = None
-    if redis_client:
-        try:
-            url = redis_client.get(f"ytdl:url:{uid}")
-        except UpstashError as e:
-            return create_error_response("Failed to connect to cache.", 500, exc=e)
+    if download_fernet and len(uid) > 12:
+        url = resolve_download_token(uid)
+    else:
+        redis_client = get_redis()
+        if redis_client:
+            try:
+                with span("kv"):
+                    url = redis_client.get(f"ytdl:url:{uid}")
+            except UpstashError as e:
+                return create_error_response("Failed to connect to cache.", 500, exc=e)
     if not url:
         return create_error_response(
             "Download link expired or invalid. Please try again.", 410
         )
     range_header = request.headers.get("Range", "bytes=0-")
-    app.logger.info(f"Handling range request for id '{uid}' with range: {range_header}")
+    app.logger.info(
+        f"Handling range request for id '{uid[:12]}' with range: {range_header}"
+    )
     return _range_download_handler(url, range_header)
 
 
@@ -411,7 +706,8 @@ def _range_download_handler(url: str, range_header: str):
         start_byte = 0
     headers = {"Range": f"bytes={start_byte}-{start_byte + RANGE_CHUNK_SIZE}"}
     try:
-        r = requests.get(url, headers=headers, stream=True, timeout=10)
+        with span("upstream_connect"):
+            r = requests.get(url, headers=headers, stream=True, timeout=10)
         r.raise_for_status()
         resp_headers = {
             "Content-Type": r.headers.get("Content-Type", "application/octet-stream"),
@@ -422,8 +718,9 @@ def _range_download_handler(url: str, range_header: str):
             resp_headers["Content-Range"] = r.headers["Content-Range"]
 
         def generate():
-            for chunk in r.iter_content(chunk_size=STREAM_CHUNK_SIZE):
-                yield chunk
+            with span("upstream_stream"):
+                for chunk in r.iter_content(chunk_size=STREAM_CHUNK_SIZE):
+                    yield chunk
 
         return Response(
             stream_with_context(generate()), headers=resp_headers, status=r.status_code
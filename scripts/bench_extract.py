@@ -0,0 +1,112 @@
+"""Compare the full extraction used by /check before with the lean profile.
+
+    python scripts/bench_extract.py [--runs 5] [URL ...]
+
+Each mode runs in its own interpreter so peak RSS is measured per mode.
+"full" keeps yt-dlp's whole info dict like the old in-request extraction,
+"lean" uses YTDL_LEAN_OPTS and the compact record the extraction workers
+return. Both use the format selectors /check builds for video requests, with
+and without ffmpeg. Needs network access to the given URLs.
+"""
+
+import argparse
+import itertools
+import json
+import os
+import pickle
+import resource
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT_DIR, "api"))
+
+DEFAULT_URLS = ["https://www.youtube.com/watch?v=jNQXAC9IVRw"]
+
+
+def peak_rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run_mode(mode: str, urls: list[str], runs: int) -> dict:
+    import ytdl
+    from _extract_pool import compact_info
+    from yt_dlp import YoutubeDL
+
+    # the selectors /check uses, so the numbers are those of the real request
+    all_opts = [
+        ytdl.build_ytdl_opts(
+            extra_opts={
+                "noplaylist": True,
+                "format": ytdl._build_check_format_string("video", has_ffmpeg, ""),
+            },
+            lean=mode == "lean",
+        )
+        for has_ffmpeg in (False, True)
+    ]
+    baseline = peak_rss_mb()
+    latencies, sizes = [], []
+    for _ in range(runs):
+        for url, opts in itertools.product(urls, all_opts):
+            start = time.perf_counter()
+            ydl = YoutubeDL(opts)
+            info = ydl.extract_info(url, download=False, process=True)
+            if mode == "lean":
+                info = compact_info(info)
+            ydl.close()
+            latencies.append(time.perf_counter() - start)
+            sizes.append(len(pickle.dumps(info)))
+            # one result alive at a time, like one request
+            del info
+
+    return {
+        "p50_ms": statistics.median(latencies) * 1000,
+        "max_ms": max(latencies) * 1000,
+        "result_kb": statistics.mean(sizes) / 1024,
+        "peak_rss_mb": peak_rss_mb(),
+        "rss_growth_mb": peak_rss_mb() - baseline,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("urls", nargs="*", default=DEFAULT_URLS)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--mode", choices=["full", "lean"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        print(json.dumps(run_mode(args.mode, args.urls, args.runs)))
+        return
+
+    results = {}
+    for mode in ("full", "lean"):
+        output = subprocess.run(
+            [sys.executable, __file__, "--mode", mode, "--runs", str(args.runs)]
+            + args.urls,
+            capture_output=True,
+            text=True,
+            cwd=ROOT_DIR,
+            # no pool processes and no redis for the benchmark
+            env={**os.environ, "EXTRACT_POOL_SIZE": "0", "KV_REST_API_URL": ""},
+        )
+        if output.returncode != 0:
+            sys.exit(f"{mode} run failed:\n{output.stderr}")
+        results[mode] = json.loads(output.stdout.splitlines()[-1])
+
+    print(
+        f"{'mode':<6} {'p50 ms':>10} {'max ms':>10} {'result KB':>10}"
+        f" {'peak MB':>10} {'growth MB':>10}"
+    )
+    for mode, result in results.items():
+        print(
+            f"{mode:<6} {result['p50_ms']:>10.1f} {result['max_ms']:>10.1f}"
+            f" {result['result_kb']:>10.1f} {result['peak_rss_mb']:>10.1f}"
+            f" {result['rss_growth_mb']:>10.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
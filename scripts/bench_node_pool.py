@@ -0,0 +1,100 @@
+"""Compare spawn-per-request Node calls with the pooled workers used by
+api/test.py.
+
+    python scripts/bench_node_pool.py [--calls 200] [--concurrency 8]
+
+Uses scripts/test.js when present, otherwise a small echo script.
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT_DIR, "api"))
+
+from _node_pool import NodePool  # noqa: E402
+
+ECHO_SCRIPT = """\
+const echo = (message) => ({ message, node: process.version });
+module.exports = echo;
+if (require.main === module) console.log(JSON.stringify(echo(process.argv[2])));
+"""
+
+
+def spawn(script: str, message: str) -> int:
+    return subprocess.run(
+        ["node", script, message], capture_output=True, text=True, cwd=ROOT_DIR
+    ).returncode
+
+
+def measure(call, calls: int, concurrency: int) -> dict[str, float]:
+    latencies = []
+
+    def timed(i: int):
+        start = time.perf_counter()
+        call(f"message {i}")
+        latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(timed, range(calls)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p95_ms": latencies[int(len(latencies) * 0.95) - 1] * 1000,
+        "rps": calls / elapsed,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--calls", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--pool-size", type=int, default=2)
+    args = parser.parse_args()
+
+    script = os.path.join(ROOT_DIR, "scripts", "test.js")
+    echo = None
+    if not os.path.exists(script):
+        echo = tempfile.NamedTemporaryFile(
+            "w", suffix=".js", dir=os.path.join(ROOT_DIR, "scripts"), delete=False
+        )
+        echo.write(ECHO_SCRIPT)
+        echo.close()
+        script = echo.name
+
+    pool = NodePool(cwd=ROOT_DIR, size=args.pool_size)
+    try:
+        # warm up so pool startup is not counted
+        pool.run([script, "warmup"])
+        results = {}
+        for concurrency in (1, args.concurrency):
+            results[f"spawn c={concurrency}"] = measure(
+                lambda message: spawn(script, message), args.calls, concurrency
+            )
+            results[f"pool  c={concurrency}"] = measure(
+                lambda message: pool.run([script, message]), args.calls, concurrency
+            )
+    finally:
+        pool.shutdown()
+        if echo:
+            os.remove(echo.name)
+
+    print(f"{'mode':<12} {'p50 ms':>10} {'p95 ms':>10} {'req/s':>10}")
+    for name, result in results.items():
+        print(
+            f"{name:<12} {result['p50_ms']:>10.2f} {result['p95_ms']:>10.2f}"
+            f" {result['rps']:>10.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,16 @@
+// Demo script for api/test.py, run on the worker pool in scripts/worker.js.
+// Also runnable directly: node scripts/test.js "message"
+function handler(message = "Hello from Node.js!") {
+  return {
+    message: `Node.js received: ${message}`,
+    node_version: process.version,
+    platform: process.platform,
+    timestamp: new Date().toISOString(),
+  };
+}
+
+module.exports = handler;
+
+if (require.main === module) {
+  console.log(JSON.stringify(handler(process.argv[2])));
+}
@@ -0,0 +1,106 @@
+// Long-lived worker for api/test.py: reads one JSON request per line on stdin
+// ({ id, script, args }) and answers with one JSON line on stdout
+// ({ id, code, stdout, stderr }). Requests are handled one at a time, in order.
+//
+// Scripts must export a function, which is called with the request's args.
+// Its resolved value becomes stdout (JSON encoded unless it is a string); when
+// it resolves to undefined, whatever it printed while running is used instead.
+// Output written outside a call goes to stderr so it can never corrupt the
+// protocol.
+const path = require("path");
+const readline = require("readline");
+
+const writeOut = process.stdout.write.bind(process.stdout);
+const writeErr = process.stderr.write.bind(process.stderr);
+const handlers = new Map();
+let current = null;
+
+class ExitSignal {
+  constructor(code) {
+    this.code = code;
+  }
+}
+
+process.stdout.write = (chunk) => {
+  if (current) {
+    current.stdout += chunk;
+    return true;
+  }
+  return writeErr(chunk);
+};
+process.stderr.write = (chunk) => {
+  if (current) {
+    current.stderr += chunk;
+    return true;
+  }
+  return writeErr(chunk);
+};
+process.exit = (code = 0) => {
+  throw new ExitSignal(code);
+};
+process.on("uncaughtException", (e) => {
+  // a late process.exit from a callback, the worker stays up
+  if (e instanceof ExitSignal) {
+    writeErr(`worker: ignored process.exit(${e.code}) outside a call\n`);
+    return;
+  }
+  writeErr(`worker: uncaught exception: ${(e && e.stack) || e}\n`);
+  process.exitCode = 1;
+  process.stdin.destroy();
+});
+process.on("unhandledRejection", (e) => {
+  writeErr(`worker: unhandled rejection: ${(e && e.stack) || e}\n`);
+});
+
+function load(script) {
+  const file = path.resolve(script);
+  let handler = handlers.get(file);
+  if (!handler) {
+    const exported = require(file);
+    if (typeof exported !== "function") {
+      throw new Error(`${script} must export a function`);
+    }
+    handler = exported;
+    handlers.set(file, handler);
+  }
+  return handler;
+}
+
+async function run(script, args) {
+  const output = (current = { stdout: "", stderr: "" });
+  let code = 0;
+  try {
+    const result = await load(script)(...args);
+    if (typeof result === "string") {
+      output.stdout = result;
+    } else if (result !== undefined) {
+      output.stdout = JSON.stringify(result);
+    }
+  } catch (e) {
+    if (e instanceof ExitSignal) {
+      code = e.code;
+    } else {
+      output.stderr += (e && e.stack) || String(e);
+      code = 1;
+    }
+  } finally {
+    current = null;
+  }
+  return { code, ...output };
+}
+
+let queue = Promise.resolve();
+
+readline.createInterface({ input: process.stdin }).on("line", (line) => {
+  let request;
+  try {
+    request = JSON.parse(line);
+  } catch (e) {
+    writeErr(`worker: invalid request: ${line}\n`);
+    return;
+  }
+  queue = queue.then(async () => {
+    const result = await run(request.script, request.args || []);
+    writeOut(JSON.stringify({ id: request.id, ...result }) + "\n");
+  });
+});
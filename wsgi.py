@@ -0,0 +1,51 @@
+"""Single WSGI entry point serving every endpoint, for self-hosting.
+
+    gunicorn --preload --workers 4 wsgi:app
+
+The three Flask apps already route on their full prefixes, so requests are
+dispatched by path without rewriting SCRIPT_NAME/PATH_INFO. Importing
+everything here lets ``--preload`` build the static manifest and other
+read-only state once in the master, shared copy-on-write by the workers;
+sockets (Redis, thread pools, Node and extraction workers) are created lazily
+per worker. The gelbooru image cache directory is shared by the workers, and
+IMAGE_CACHE_MAX_BYTES bounds the directory as a whole.
+api/test.py is a plain ``BaseHTTPRequestHandler`` and is not mounted.
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "api"))
+
+import gelbooru  # noqa: E402
+import index  # noqa: E402
+import ytdl  # noqa: E402
+
+
+class PrefixDispatcher:
+    def __init__(self, default, mounts: dict):
+        self.default = default
+        # longest prefix first so nested mounts win
+        self.mounts = sorted(mounts.items(), key=lambda item: -len(item[0]))
+
+    def __call__(self, environ, start_response):
+        path = environ.get("PATH_INFO", "")
+        for prefix, app in self.mounts:
+            if path == prefix or path.startswith(prefix + "/"):
+                return app(environ, start_response)
+        return self.default(environ, start_response)
+
+
+app = PrefixDispatcher(
+    index.app,
+    {
+        ytdl.PREFIX: ytdl.app,
+        gelbooru.PREFIX: gelbooru.app,
+    },
+)
+
+
+if __name__ == "__main__":
+    from werkzeug.serving import run_simple
+
+    run_simple("0.0.0.0", 8000, app, threaded=True)